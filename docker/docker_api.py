@@ -1,10 +1,27 @@
+import asyncio
+import gc
+import hashlib
+import marshal
+import os
+import pickle
+import re
+import select
+import signal
+import statistics
+import sys
+import tempfile
+import threading
 import time
+import tracemalloc
 import traceback
-from contextlib import redirect_stdout, redirect_stderr
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext, redirect_stdout, redirect_stderr
 from io import StringIO
-from multiprocessing import Process, Manager
-from typing import List, Optional, Any
-from fastapi import FastAPI, HTTPException
+from multiprocessing import Process, Manager, Pipe
+from multiprocessing.connection import Client, Listener
+from typing import List, Literal, Optional, Any
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel, Field
 import ast
 
@@ -23,28 +40,449 @@ class TestCaseResult(BaseModel):
     input_args: Optional[Any] = None  # Add input arguments
     expected_output: Optional[Any] = None  # Add expected output
     actual_output: Optional[Any] = None  # Add actual output
+    cost: Optional[int] = None  # executed instructions or line events, see cost_metric
+
+class BenchmarkResult(BaseModel):
+    runtime: float  # median seconds per run of all tests, outliers excluded
+    runtime_samples: List[float]  # seconds per run, each averaged over `loops` runs
+    loops: int = 1
+    outliers: int = 0
+    peak_memory: int  # bytes allocated at peak during one run of all tests
+
+class EfficiencyResult(BaseModel):
+    candidate: Optional[BenchmarkResult] = None
+    reference: Optional[BenchmarkResult] = None
+    runtime_ratio: Optional[float] = None  # candidate / reference, < 1 means faster
+    memory_ratio: Optional[float] = None  # candidate / reference
+    error: Optional[str] = None
+
+class TraceSpan(BaseModel):
+    name: str
+    process: str  # 'api' or 'worker'
+    start: float  # unix time in seconds
+    duration: float  # seconds
+    args: Optional[dict] = None
 
 class ExecutionResponse(BaseModel):
     verdict: str  # 'All tests passed' or 'At least one test error'
     details: List[TestCaseResult]
+    efficiency: Optional[EfficiencyResult] = None
+    queue_wait: Optional[float] = None  # seconds the job waited for a worker
+    trace: Optional[List[TraceSpan]] = None  # only for requests with a traceparent header
 
 class CodeExecutionRequest(BaseModel):
     code: str
     tests: List[str]
     timeout: int = Field(default=20, ge=1, le=100)
+    benchmark: bool = False  # time passing solutions, see benchmark_tests
+    reference_code: Optional[str] = None  # benchmarked against the candidate when set
+    benchmark_runs: int = Field(default=5, ge=1, le=100)
+    warmup_runs: int = Field(default=1, ge=0, le=20)
+    cost_metric: Optional[Literal['instructions', 'lines']] = None  # count per test, see InstructionCounter
+    isolate_tests: bool = False  # run each test in its own fork, see run_tests_isolated
+    harness: Optional[str] = None  # test harness run after code, set up once per harness in a zygote
+    tenant_id: str = Field(default="default", min_length=1, max_length=128)
+    priority: Literal['interactive', 'batch'] = 'interactive'  # see FairScheduler
+
+_MONITORING_TOOL_ID = 3  # ids 0-2 and 5 are reserved for debuggers, coverage, profilers and optimizers
+
+class InstructionCounter:
+    """Count executed bytecode instructions or line events in the current thread.
+
+    Uses sys.monitoring on Python 3.12+ and falls back to sys.settrace with
+    opcode tracing on older interpreters. Unlike wall-clock time, the count
+    only depends on the code and the interpreter version, not on machine load.
+    """
+
+    def __init__(self, metric: str):
+        self.metric = metric
+        self.count = 0
+        self._previous_trace = None
+        self._line_tables = {}
+
+    def __enter__(self):
+        self.count = 0
+        if hasattr(sys, 'monitoring'):
+            events = sys.monitoring.events
+            event = events.INSTRUCTION if self.metric == 'instructions' else events.LINE
+            sys.monitoring.use_tool_id(_MONITORING_TOOL_ID, 'execution_metrics')
+            sys.monitoring.register_callback(_MONITORING_TOOL_ID, event, self._on_event)
+            if self.metric == 'lines':
+                # LINE only fires when the line number changes, so a loop on a single line would
+                # count once; settrace reports a line event for every jump back, count those too
+                sys.monitoring.register_callback(_MONITORING_TOOL_ID, events.JUMP, self._on_jump)
+                event |= events.JUMP
+            sys.monitoring.set_events(_MONITORING_TOOL_ID, event)
+        else:
+            self._previous_trace = sys.gettrace()
+            sys.settrace(self._trace_call)
+        return self
+
+    def __exit__(self, *exc_info):
+        if hasattr(sys, 'monitoring'):
+            sys.monitoring.set_events(_MONITORING_TOOL_ID, 0)
+            sys.monitoring.free_tool_id(_MONITORING_TOOL_ID)
+        else:
+            sys.settrace(self._previous_trace)
+        return False
+
+    def _on_event(self, code, location):
+        self.count += 1
+
+    def _on_jump(self, code, instruction_offset, destination_offset):
+        # Backward jumps to another line already raise a LINE event there
+        if destination_offset <= instruction_offset:
+            lines = self._line_tables.get(code)
+            if lines is None:
+                lines = self._line_tables[code] = {offset: line for start, end, line in code.co_lines()
+                                                   for offset in range(start, end, 2)}
+            if lines.get(destination_offset) == lines.get(instruction_offset):
+                self.count += 1
+
+    def _trace_call(self, frame, event, arg):
+        if self.metric == 'instructions':
+            frame.f_trace_opcodes = True
+            frame.f_trace_lines = False
+        return self._trace_local
+
+    def _trace_local(self, frame, event, arg):
+        if event == ('opcode' if self.metric == 'instructions' else 'line'):
+            self.count += 1
+        return self._trace_local
+
+CODE_CACHE_MAX_BYTES = int(os.environ.get('CODE_CACHE_MAX_MB', '256')) * 1024 * 1024
+CODE_CACHE_SEEN_ENTRIES = 65536
+
+class CodeCache:
+    """Marshalled code objects of sources submitted more than once, within max_bytes.
+
+    The cache lives in the API process, which compiles but never runs candidate
+    code, so candidates cannot tamper with it. Workers and zygote forks receive
+    the marshalled code with the job and only unmarshal it. Most sources, e.g.
+    pass@k candidates, are submitted once; those are compiled by the worker and
+    only their hash is remembered here, so the API compiles just the sources
+    that come back. Least recently used entries are dropped first. Thread safe.
+    """
+
+    def __init__(self, max_bytes: int, seen_entries: int = CODE_CACHE_SEEN_ENTRIES):
+        self.max_bytes = max_bytes
+        self.seen_entries = seen_entries
+        self._entries = OrderedDict()
+        self._size = 0
+        # Hashes of sources submitted before, False for those that do not compile
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source: str, filename: str = '<string>') -> Optional[bytes]:
+        """
+        Marshalled compile(source, filename, 'exec') for a source submitted before.
+
+        Returns None, for the worker to compile the source itself, on the first
+        submission, if it does not compile or if the cache is disabled.
+        """
+        if self.max_bytes <= 0:
+            return None
+        key = hashlib.sha256(filename.encode() + b'\0' + source.encode('utf-8', 'surrogatepass')).digest()
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+            compiles = self._seen.get(key)
+            self._seen[key] = compiles is not False
+            self._seen.move_to_end(key)
+            if len(self._seen) > self.seen_entries:
+                self._seen.popitem(last=False)
+            if not compiles:
+                return None
+        try:
+            data = marshal.dumps(compile(source, filename, 'exec'))
+        except Exception:
+            # The worker compiles it again and reports the error as usual
+            with self._lock:
+                self._seen[key] = False
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, oldest = self._entries.popitem(last=False)
+                    self._size -= len(oldest)
+        return data
+
+code_cache = CodeCache(CODE_CACHE_MAX_BYTES)
+
+TRACEPARENT_PATTERN = re.compile(r'^[0-9a-f]{2}-(?!0{32})[0-9a-f]{32}-(?!0{16})[0-9a-f]{16}-[0-9a-f]{2}$')
+
+class Tracer:
+    """Records timed spans of one request, or nothing when disabled.
+
+    Spans use wall-clock start times so that spans recorded by the evaluator,
+    the API and the worker process line up on one timeline.
+    """
+
+    def __init__(self, enabled: bool, process: str = 'api'):
+        self.enabled = enabled
+        self.process = process
+        self.spans = []
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name: str, args: dict):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.spans.append({'name': name, 'process': self.process, 'start': start,
+                               'duration': time.time() - start, 'args': args or None})
+
+BENCHMARK_MIN_SAMPLE_TIME = 0.005  # seconds
+
+def reject_outliers(samples: List[float], threshold: float = 3.0) -> List[float]:
+    """Drop samples further than `threshold` robust deviations (MAD) from the median."""
+    if len(samples) < 3:
+        return samples
+    median = statistics.median(samples)
+    mad = statistics.median(abs(sample - median) for sample in samples)
+    if mad == 0:
+        return samples
+    return [sample for sample in samples if abs(sample - median) / (1.4826 * mad) <= threshold]
+
+def calibrate_loops(run_loops) -> int:
+    """Smallest of 1, 2, 5, 10, 20, 50, ... runs that lasts BENCHMARK_MIN_SAMPLE_TIME, as timeit's autorange."""
+    base = 1
+    while True:
+        for multiplier in (1, 2, 5):
+            loops = base * multiplier
+            if run_loops(loops) >= BENCHMARK_MIN_SAMPLE_TIME:
+                return loops
+        base *= 10
+
+def benchmark_tests(tests: List[str], local_namespace: dict, runs: int, warmup_runs: int) -> dict:
+    """Time repeated runs of all tests in an already warm namespace.
+
+    Warm-up runs are discarded. As timeit.Timer.autorange does, the number of
+    runs per sample is calibrated so that each sample lasts at least
+    BENCHMARK_MIN_SAMPLE_TIME, which keeps timer resolution out of fast tests.
+    Timed runs are done with the garbage collector disabled (as timeit does)
+    and peak memory is measured in a separate run so that tracemalloc overhead
+    does not leak into the timings.
+    """
+    compiled_tests = [compile(test, '<test>', 'exec') for test in tests]
 
-def run_code_and_tests(code: str, tests: List[str], shared_dict, timeout: int):
+    def run_once():
+        for compiled_test in compiled_tests:
+            exec(compiled_test, local_namespace)
+
+    def run_loops(loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            run_once()
+        return time.perf_counter() - start
+
+    samples = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+        for _ in range(warmup_runs):
+            run_once()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            loops = calibrate_loops(run_loops)
+            for _ in range(runs):
+                samples.append(run_loops(loops) / loops)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        tracemalloc.start()
+        try:
+            run_once()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    kept = reject_outliers(samples)
+    return BenchmarkResult(
+        runtime=statistics.median(kept),
+        runtime_samples=samples,
+        loops=loops,
+        outliers=len(samples) - len(kept),
+        peak_memory=peak_memory
+    ).dict()
+
+def run_test(test: str, local_namespace: dict, stdout_buffer: StringIO, stderr_buffer: StringIO,
+             counter: Optional[InstructionCounter] = None) -> dict:
+    try:
+        # Extract input arguments and expected output from test
+        input_args = None
+        expected_output = None
+        actual_output = None
+
+        # Try to extract input arguments and expected output
+        if "assert" in test:
+            # Extract the function call and expected result
+            parts = test.split("assert")[1].strip()
+            if "==" in parts:
+                func_call, expected = parts.split("==")
+                try:
+                    # Try to evaluate the expected output
+                    expected_output = ast.literal_eval(expected.strip())
+                    # Try to extract input arguments from function call
+                    func_name = func_call.split("(")[0].strip()
+                    args_str = func_call.split("(")[1].split(")")[0]
+                    try:
+                        input_args = ast.literal_eval(args_str)
+                    except:
+                        input_args = args_str
+                except:
+                    pass
+
+        # Execute the test and capture output
+        with redirect_stdout(StringIO()) as test_stdout, redirect_stderr(StringIO()) as test_stderr, \
+                counter or nullcontext():
+            exec(test, local_namespace)
+            actual_output = test_stdout.getvalue().strip()
+
+        return TestCaseResult(
+            test=test,
+            status="passed",
+            output=stdout_buffer.getvalue(),
+            input_args=input_args,
+            expected_output=expected_output,
+            actual_output=actual_output,
+            cost=counter.count if counter else None
+        ).dict()
+    except AssertionError as e:
+        error_msg = f"AssertionError: {str(e)}\nTraceback:\n{traceback.format_exc()}\nStderr:\n{stderr_buffer.getvalue()}"
+        return TestCaseResult(
+            test=test,
+            status="failed",
+            error_type="AssertionError",
+            traceback=error_msg,
+            output=stdout_buffer.getvalue(),
+            input_args=input_args,
+            expected_output=expected_output,
+            actual_output=actual_output,
+            cost=counter.count if counter else None
+        ).dict()
+    except Exception as e:
+        error_msg = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}\nStderr:\n{stderr_buffer.getvalue()}"
+        error_type = type(e).__name__
+        return TestCaseResult(
+            test=test,
+            status="failed",
+            error_type=error_type,
+            traceback=error_msg,
+            output=stdout_buffer.getvalue(),
+            input_args=input_args,
+            expected_output=expected_output,
+            actual_output=actual_output,
+            cost=counter.count if counter else None
+        ).dict()
+
+def _run_forked_test(test: str, local_namespace: dict, stdout_buffer: StringIO, stderr_buffer: StringIO,
+                     cost_metric: Optional[str], timeout: int, write_fd: int):
+    try:
+        # Make sure the child does not outlive a job that gets terminated
+        signal.alarm(timeout)
+        counter = InstructionCounter(cost_metric) if cost_metric else None
+        payload = pickle.dumps(run_test(test, local_namespace, stdout_buffer, stderr_buffer, counter))
+        with os.fdopen(write_fd, 'wb') as pipe:
+            pipe.write(payload)
+    finally:
+        os._exit(0)
+
+def _forked_test_result(test: str, payload: bytes, status: int) -> dict:
+    if payload:
+        return pickle.loads(payload)
+    if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGALRM:
+        return TestCaseResult(
+            test=test,
+            status="failed",
+            error_type="TimeLimit",
+            traceback="Test process exceeded the job time limit."
+        ).dict()
+    return TestCaseResult(
+        test=test,
+        status="failed",
+        error_type="RuntimeError",
+        traceback=f"Test process exited without a result (wait status {status})."
+    ).dict()
+
+def job_cpu_allowance() -> int:
+    """CPUs a job starting now may use: the node's CPUs shared between the jobs the scheduler is running."""
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    return max(cpus // max(scheduler.running_jobs(), 1), 1)
+
+def run_tests_isolated(tests: List[str], local_namespace: dict, stdout_buffer: StringIO, stderr_buffer: StringIO,
+                       cost_metric: Optional[str], timeout: int, max_workers: int = 1) -> List[dict]:
+    """Run every test in its own fork of the already set up job process.
+
+    Children share the post-setup state copy-on-write, so a test that mutates
+    globals cannot affect the tests after it. Up to `max_workers` children run
+    at a time, and results are returned in test order.
+    """
+    results = [None] * len(tests)
+    running = {}  # pipe read end -> (pid, test index, received chunks)
+    next_index = 0
+    # Keep the collector in the children from writing to (and so copying) every inherited object
+    gc.freeze()
+    try:
+        while next_index < len(tests) or running:
+            while next_index < len(tests) and len(running) < max_workers:
+                read_fd, write_fd = os.pipe()
+                pid = os.fork()
+                if pid == 0:
+                    os.close(read_fd)
+                    _run_forked_test(tests[next_index], local_namespace, stdout_buffer, stderr_buffer,
+                                     cost_metric, timeout, write_fd)
+                os.close(write_fd)
+                running[read_fd] = (pid, next_index, [])
+                next_index += 1
+
+            ready, _, _ = select.select(list(running), [], [])
+            for read_fd in ready:
+                pid, index, chunks = running[read_fd]
+                chunk = os.read(read_fd, 65536)
+                if chunk:
+                    chunks.append(chunk)
+                    continue
+                os.close(read_fd)
+                del running[read_fd]
+                _, status = os.waitpid(pid, 0)
+                results[index] = _forked_test_result(tests[index], b''.join(chunks), status)
+    finally:
+        gc.unfreeze()
+    return results
+
+def run_code_and_tests(code: str, tests: List[str], shared_dict, timeout: int,
+                       benchmark_runs: int = 0, warmup_runs: int = 0, cost_metric: Optional[str] = None,
+                       isolate_tests: bool = False, trace: bool = False, test_workers: int = 1,
+                       namespace: Optional[dict] = None,
+                       harness_bindings: Optional[dict] = None, compiled_code: Optional[bytes] = None):
     results = []
     verdict = "All tests passed"
     start_time = time.time()
     stdout_buffer = StringIO()
     stderr_buffer = StringIO()
+    tracer = Tracer(trace, process='worker')
     
     try:
-        local_namespace = {'__builtins__': __builtins__}
+        local_namespace = namespace if namespace is not None else {'__builtins__': __builtins__}
         # Try to compile the code first
         try:
-            compiled = compile(code, '<string>', 'exec')
+            with tracer.span('compile'):
+                if compiled_code is not None:
+                    compiled = marshal.loads(compiled_code)
+                else:
+                    compiled = compile(code, '<string>', 'exec')
         except Exception as e:
             verdict = "At least one test error"
             results = [TestCaseResult(
@@ -60,8 +498,11 @@ def run_code_and_tests(code: str, tests: List[str], shared_dict, timeout: int):
             
         # Execute the code
         try:
-            with redirect_stdout(stdout_buffer), redirect_stderr(stderr_buffer):
+            with tracer.span('exec'), redirect_stdout(stdout_buffer), redirect_stderr(stderr_buffer):
                 exec(compiled, local_namespace)
+                if harness_bindings:
+                    # The harness was set up before the code; its names win as if it had run after
+                    local_namespace.update(harness_bindings)
                 # Print the namespace for debugging
                 print("Available functions:", [name for name in local_namespace if not name.startswith('__')])
         except Exception as e:
@@ -79,72 +520,31 @@ def run_code_and_tests(code: str, tests: List[str], shared_dict, timeout: int):
             return
             
         # Run each test
-        for test in tests:
-            try:
-                # Extract input arguments and expected output from test
-                input_args = None
-                expected_output = None
-                actual_output = None
-                
-                # Try to extract input arguments and expected output
-                if "assert" in test:
-                    # Extract the function call and expected result
-                    parts = test.split("assert")[1].strip()
-                    if "==" in parts:
-                        func_call, expected = parts.split("==")
-                        try:
-                            # Try to evaluate the expected output
-                            expected_output = ast.literal_eval(expected.strip())
-                            # Try to extract input arguments from function call
-                            func_name = func_call.split("(")[0].strip()
-                            args_str = func_call.split("(")[1].split(")")[0]
-                            try:
-                                input_args = ast.literal_eval(args_str)
-                            except:
-                                input_args = args_str
-                        except:
-                            pass
-                
-                # Execute the test and capture output
-                with redirect_stdout(StringIO()) as test_stdout, redirect_stderr(StringIO()) as test_stderr:
-                    exec(test, local_namespace)
-                    actual_output = test_stdout.getvalue().strip()
-                
-                results.append(TestCaseResult(
-                    test=test,
-                    status="passed",
-                    output=stdout_buffer.getvalue(),
-                    input_args=input_args,
-                    expected_output=expected_output,
-                    actual_output=actual_output
-                ).dict())
-            except AssertionError as e:
+        if isolate_tests:
+            with tracer.span('tests', isolated=True, workers=test_workers):
+                results = run_tests_isolated(tests, local_namespace, stdout_buffer, stderr_buffer, cost_metric, timeout,
+                                             test_workers)
+            if any(result['status'] == "failed" for result in results):
                 verdict = "At least one test error"
-                error_msg = f"AssertionError: {str(e)}\nTraceback:\n{traceback.format_exc()}\nStderr:\n{stderr_buffer.getvalue()}"
-                results.append(TestCaseResult(
-                    test=test,
-                    status="failed",
-                    error_type="AssertionError",
-                    traceback=error_msg,
-                    output=stdout_buffer.getvalue(),
-                    input_args=input_args,
-                    expected_output=expected_output,
-                    actual_output=actual_output
-                ).dict())
+        else:
+            counter = InstructionCounter(cost_metric) if cost_metric else None
+            for index, test in enumerate(tests):
+                with tracer.span('test', index=index):
+                    result = run_test(test, local_namespace, stdout_buffer, stderr_buffer, counter)
+                if result['status'] == "failed":
+                    verdict = "At least one test error"
+                results.append(result)
+
+        # Benchmark only solutions that passed; publish the verdict first so a
+        # benchmark that runs out of time does not turn a pass into a timeout
+        if benchmark_runs > 0 and verdict == "All tests passed":
+            shared_dict['verdict'] = verdict
+            shared_dict['details'] = results
+            try:
+                with tracer.span('benchmark', runs=benchmark_runs, warmup_runs=warmup_runs):
+                    shared_dict['benchmark'] = benchmark_tests(tests, local_namespace, benchmark_runs, warmup_runs)
             except Exception as e:
-                verdict = "At least one test error"
-                error_msg = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}\nStderr:\n{stderr_buffer.getvalue()}"
-                error_type = type(e).__name__
-                results.append(TestCaseResult(
-                    test=test,
-                    status="failed",
-                    error_type=error_type,
-                    traceback=error_msg,
-                    output=stdout_buffer.getvalue(),
-                    input_args=input_args,
-                    expected_output=expected_output,
-                    actual_output=actual_output
-                ).dict())
+                shared_dict['benchmark_error'] = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}"
     except Exception as e:
         verdict = "At least one test error"
         error_msg = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}\nStderr:\n{stderr_buffer.getvalue()}"
@@ -160,42 +560,588 @@ def run_code_and_tests(code: str, tests: List[str], shared_dict, timeout: int):
         shared_dict['verdict'] = verdict
         shared_dict['details'] = results
         shared_dict['elapsed'] = elapsed
+        if trace:
+            shared_dict['spans'] = tracer.spans
+
+ZYGOTE_MEMORY_BUDGET = int(os.environ.get('ZYGOTE_MEMORY_BUDGET_MB', '2048')) * 1024 * 1024
+ZYGOTE_SETUP_TIMEOUT = 60
+ZYGOTE_RETRY_DELAY = 300  # seconds before a harness that timed out is tried again
+MAX_FAILED_HARNESSES = 1024
+
+class HarnessSetupError(Exception):
+    """The harness raised when run on its own."""
+
+class _StreamedDict(dict):
+    """Result dict that also sends every update to the API, like a Manager dict does."""
+
+    def __init__(self, conn):
+        super().__init__()
+        self._conn = conn
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._conn.send((key, value))
+
+def _zygote_main(harness: str, address: str, ready_conn):
+    # Handlers the server installed are inherited through fork; terminate() must stop the zygote
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    namespace = {'__builtins__': __builtins__}
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull), redirect_stderr(devnull):
+            exec(compile(harness, '<harness>', 'exec'), namespace)
+    except BaseException:
+        ready_conn.send(traceback.format_exc())
+        return
+    harness_bindings = dict(namespace)
+    listener = Listener(address, family='AF_UNIX')
+    # Candidates are never waited for here, let the kernel reap them
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    gc.freeze()
+    ready_conn.send(None)
+    ready_conn.close()
+
+    while True:
+        conn = listener.accept()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                code, compiled_code, tests, timeout, options = conn.recv()
+                # Backstop in case the API goes away; it kills the candidate itself on timeout
+                signal.alarm(timeout + 5)
+                # The candidate must not see the harness, as if it ran before it. The dict is
+                # cleared rather than replaced because it is the harness functions' __globals__
+                namespace.clear()
+                namespace['__builtins__'] = __builtins__
+                conn.send(os.getpid())
+                run_code_and_tests(code, tests, _StreamedDict(conn), timeout, *options, namespace=namespace,
+                                   harness_bindings=harness_bindings, compiled_code=compiled_code)
+                conn.send(None)
+            finally:
+                os._exit(0)
+        conn.close()
+
+class Zygote:
+    """A warm process that has run one test harness and forks a child per candidate."""
+
+    def __init__(self, process: Process, address: str):
+        self.process = process
+        self.address = address
+
+    @classmethod
+    def start(cls, harness: str, address: str) -> Optional['Zygote']:
+        """
+        Start a zygote for a harness.
+
+        Returns:
+            The zygote, or None if the harness took too long or its process died
+
+        Raises:
+            HarnessSetupError: If the harness raised
+        """
+        ready_conn, child_conn = Pipe(duplex=False)
+        process = Process(target=_zygote_main, args=(harness, address, child_conn), daemon=True)
+        process.start()
+        child_conn.close()
+        zygote = cls(process, address)
+        error = None
+        try:
+            if ready_conn.poll(ZYGOTE_SETUP_TIMEOUT):
+                error = ready_conn.recv()
+                if error is None:
+                    return zygote
+        except EOFError:
+            pass
+        finally:
+            ready_conn.close()
+        zygote.stop()
+        if error is not None:
+            raise HarnessSetupError(error)
+        return None
+
+    def memory(self) -> int:
+        """Private memory of the zygote in bytes; pages shared with the API are not counted."""
+        try:
+            with open(f"/proc/{self.process.pid}/smaps_rollup") as f:
+                return sum(int(line.split()[1]) * 1024 for line in f if line.startswith('Private_'))
+        except (OSError, ValueError):
+            try:
+                with open(f"/proc/{self.process.pid}/statm") as f:
+                    return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            except (OSError, ValueError):
+                return 0
+
+    def execute(self, code: str, tests: List[str], timeout: int, options: tuple,
+                compiled_code: Optional[bytes] = None):
+        """Run a candidate in a fork of the zygote, returns its results and whether it timed out."""
+        shared_dict = {}
+        with Client(self.address, family='AF_UNIX') as conn:
+            conn.send((code, compiled_code, tests, timeout, options))
+            pid = conn.recv()
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not conn.poll(remaining):
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                    return shared_dict, True
+                try:
+                    update = conn.recv()
+                except EOFError:
+                    break  # the candidate process died, report what it got to
+                if update is None:
+                    break
+                key, value = update
+                shared_dict[key] = value
+        return shared_dict, False
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+class ZygotePool:
+    """Zygotes by harness, least recently used ones are stopped to stay within the memory budget."""
+
+    def __init__(self, memory_budget: int):
+        self.memory_budget = memory_budget
+        self._zygotes = OrderedDict()
+        self._starting = {}
+        # Harnesses to run with the code instead, until the given time.monotonic()
+        self._failed = OrderedDict()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._socket_dir = None
+
+    def get(self, harness: str) -> Optional[Zygote]:
+        """
+        Zygote for a harness, started on first use.
+
+        A zygote is started outside the lock, so requests for other harnesses
+        are not held up; concurrent requests for the same harness wait for the
+        one start. Returns None if the harness must be appended to the code:
+        always for a harness that raised on its own, and for a while after one
+        timed out.
+        """
+        key = hashlib.sha256(harness.encode('utf-8', 'replace')).hexdigest()
+        stopped = []
+        with self._lock:
+            zygote = self._zygotes.get(key)
+            if zygote is not None:
+                if zygote.process.is_alive():
+                    self._zygotes.move_to_end(key)
+                    return zygote
+                del self._zygotes[key]
+                stopped.append(zygote)
+            future = self._starting.get(key)
+            starting = future is None and time.monotonic() >= self._failed.get(key, 0.0)
+            if starting:
+                future = self._starting[key] = Future()
+                if self._socket_dir is None:
+                    self._socket_dir = tempfile.mkdtemp(prefix='zygotes-')
+                # A fresh address, a stopped zygote may still unlink its own
+                self._started += 1
+                address = os.path.join(self._socket_dir, f"{key[:32]}-{self._started}.sock")
+        for old in stopped:
+            old.stop()
+        if future is None:
+            return None
+        if not starting:
+            return future.result()
+
+        zygote = None
+        retry_at = time.monotonic() + ZYGOTE_RETRY_DELAY
+        try:
+            zygote = Zygote.start(harness, address)
+        except HarnessSetupError:
+            retry_at = float('inf')
+        finally:
+            with self._lock:
+                del self._starting[key]
+                if zygote is None:
+                    self._failed[key] = retry_at
+                    self._failed.move_to_end(key)
+                    if len(self._failed) > MAX_FAILED_HARNESSES:
+                        self._failed.popitem(last=False)
+                else:
+                    self._failed.pop(key, None)
+                    self._zygotes[key] = zygote
+                    stopped = self._evict()
+            future.set_result(zygote)
+        for old in stopped:
+            old.stop()
+        return zygote
+
+    def discard(self, zygote: Zygote):
+        with self._lock:
+            for key, candidate in list(self._zygotes.items()):
+                if candidate is zygote:
+                    del self._zygotes[key]
+        zygote.stop()
+
+    def close(self):
+        with self._lock:
+            zygotes = list(self._zygotes.values())
+            self._zygotes.clear()
+        for zygote in zygotes:
+            zygote.stop()
+
+    def _evict(self) -> List[Zygote]:
+        """Take zygotes out of the pool until it fits the budget, returns them to be stopped."""
+        evicted = []
+        # The newest zygote is always kept, even if it alone exceeds the budget
+        while len(self._zygotes) > 1 and sum(z.memory() for z in self._zygotes.values()) > self.memory_budget:
+            _, oldest = self._zygotes.popitem(last=False)
+            evicted.append(oldest)
+        return evicted
+
+zygote_pool = ZygotePool(ZYGOTE_MEMORY_BUDGET)
 
-def execute_with_timeout(code: str, tests: List[str], timeout: int) -> ExecutionResponse:
-    with Manager() as manager:
+def build_response(shared_dict: dict, timed_out: bool, timeout: int, benchmark_runs: int = 0) -> ExecutionResponse:
+    if timed_out and 'elapsed' in shared_dict:
+        timed_out = False  # the job had finished when it was stopped
+    if timed_out:
+        if benchmark_runs > 0 and 'details' in shared_dict and 'benchmark' not in shared_dict:
+            # Tests finished in time, only the benchmark did not
+            return ExecutionResponse(
+                verdict=shared_dict['verdict'],
+                details=shared_dict['details'],
+                efficiency=EfficiencyResult(error=f"Benchmark exceeded time limit of {timeout} seconds.")
+            )
+        # Timeout occurred
+        details = [TestCaseResult(
+            test="<timeout>",
+            status="failed",
+            error_type="TimeLimit",
+            traceback=f"Execution exceeded time limit of {timeout} seconds."
+        ).dict()]
+        return ExecutionResponse(verdict="At least one test error", details=details)
+    # Normal case
+    verdict = shared_dict.get('verdict', 'At least one test error')
+    details = shared_dict.get('details', [])
+    efficiency = None
+    if 'benchmark' in shared_dict:
+        efficiency = EfficiencyResult(candidate=BenchmarkResult(**shared_dict['benchmark']))
+    elif 'benchmark_error' in shared_dict:
+        efficiency = EfficiencyResult(error=shared_dict['benchmark_error'])
+    return ExecutionResponse(verdict=verdict, details=details, efficiency=efficiency)
+
+def execute_with_timeout(code: str, tests: List[str], timeout: int,
+                         benchmark_runs: int = 0, warmup_runs: int = 0,
+                         cost_metric: Optional[str] = None, isolate_tests: bool = False,
+                         harness: Optional[str] = None, tracer: Optional[Tracer] = None) -> ExecutionResponse:
+    tracer = tracer or Tracer(False)
+    test_workers = job_cpu_allowance() if isolate_tests else 1
+    options = (benchmark_runs, warmup_runs, cost_metric, isolate_tests, tracer.enabled, test_workers)
+    if harness:
+        with tracer.span('zygote_get'):
+            zygote = zygote_pool.get(harness)
+        if zygote is not None:
+            with tracer.span('compile'):
+                compiled_code = code_cache.get(code)
+            try:
+                with tracer.span('zygote_execute'):
+                    shared_dict, timed_out = zygote.execute(code, tests, timeout, options, compiled_code)
+                return traced_response(shared_dict, timed_out, timeout, tracer, benchmark_runs)
+            except (OSError, EOFError):
+                # The zygote went away before taking the job, run it the regular way
+                zygote_pool.discard(zygote)
+        code = f"{code}\n\n{harness}\n"
+
+    with tracer.span('compile'):
+        compiled_code = code_cache.get(code)
+    with tracer.span('manager_start'):
+        manager = Manager()
+    with manager:
         shared_dict = manager.dict()
-        p = Process(target=run_code_and_tests, args=(code, tests, shared_dict, timeout))
-        p.start()
-        p.join(timeout)
-        if p.is_alive():
+        p = Process(target=run_code_and_tests, args=(code, tests, shared_dict, timeout, *options),
+                    kwargs={'compiled_code': compiled_code})
+        with tracer.span('process_spawn'):
+            p.start()
+        with tracer.span('process_join'):
+            p.join(timeout)
+        timed_out = p.is_alive()
+        if timed_out:
             p.terminate()
             p.join()
-            # Timeout occurred
-            details = [TestCaseResult(
-                test="<timeout>",
-                status="failed",
-                error_type="TimeLimit",
-                traceback=f"Execution exceeded time limit of {timeout} seconds."
-            ).dict()]
-            return ExecutionResponse(verdict="At least one test error", details=details)
-        # Normal case
-        verdict = shared_dict.get('verdict', 'At least one test error')
-        details = shared_dict.get('details', [])
-        return ExecutionResponse(verdict=verdict, details=details)
+        return traced_response(dict(shared_dict), timed_out, timeout, tracer, benchmark_runs)
+
+def traced_response(shared_dict: dict, timed_out: bool, timeout: int, tracer: Tracer,
+                    benchmark_runs: int = 0) -> ExecutionResponse:
+    with tracer.span('response_build'):
+        response = build_response(shared_dict, timed_out, timeout, benchmark_runs)
+    tracer.spans.extend(shared_dict.get('spans', []))
+    return response
+
+def execute_with_benchmark(request: CodeExecutionRequest, tracer: Optional[Tracer] = None) -> ExecutionResponse:
+    """Run the candidate and, if it passes, benchmark it against the reference solution.
+
+    Candidate and reference are measured in separate worker processes with the
+    same tests, so the ratios compare like with like.
+    """
+    tracer = tracer or Tracer(False)
+    with tracer.span('candidate'):
+        response = execute_with_timeout(request.code, request.tests, request.timeout,
+                                        request.benchmark_runs, request.warmup_runs,
+                                        request.cost_metric, request.isolate_tests, request.harness, tracer)
+    if response.efficiency is None or response.efficiency.candidate is None or not request.reference_code:
+        return response
+
+    with tracer.span('reference'):
+        reference = execute_with_timeout(request.reference_code, request.tests, request.timeout,
+                                         request.benchmark_runs, request.warmup_runs,
+                                         isolate_tests=request.isolate_tests, harness=request.harness,
+                                         tracer=tracer)
+    efficiency = response.efficiency
+    if reference.efficiency is None or reference.efficiency.candidate is None:
+        efficiency.error = f"Reference solution could not be benchmarked: {reference.verdict}"
+        if reference.efficiency is not None and reference.efficiency.error:
+            efficiency.error += f"\n{reference.efficiency.error}"
+        return response
+
+    efficiency.reference = reference.efficiency.candidate
+    if efficiency.reference.runtime > 0:
+        efficiency.runtime_ratio = efficiency.candidate.runtime / efficiency.reference.runtime
+    if efficiency.reference.peak_memory > 0:
+        efficiency.memory_ratio = efficiency.candidate.peak_memory / efficiency.reference.peak_memory
+    return response
+
+PRIORITY_WEIGHTS = {'interactive': 8, 'batch': 1}
+SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', os.cpu_count() or 1))
+MAX_RECORDED_WAITS = 1000
+MAX_RECORDED_TENANTS = 1000
+
+def parse_tenant_quotas(spec: str) -> dict:
+    """Parse 'tenant=limit,...' as given in TENANT_QUOTAS."""
+    quotas = {}
+    for item in spec.split(','):
+        if item.strip():
+            tenant_id, limit = item.split('=')
+            quotas[tenant_id.strip()] = int(limit)
+    return quotas
+
+class ScheduledJob:
+    def __init__(self, tenant_id: str, priority: str, start_tag: float, fn, future: Future,
+                 benchmark: bool = False):
+        self.tenant_id = tenant_id
+        self.priority = priority
+        self.start_tag = start_tag
+        self.fn = fn
+        self.future = future
+        self.benchmark = benchmark
+        self.enqueued_at = time.monotonic()
+
+class FairScheduler:
+    """Weighted fair queuing of jobs from several tenants over a fixed set of workers.
+
+    Every (tenant, priority) pair is a flow with its own FIFO queue. Jobs get
+    start-time fair queuing tags: a flow's tags advance by cost / weight per
+    job, and the job with the smallest start tag runs next, so a busy flow
+    cannot starve the others. Interactive jobs weigh more than batch jobs, and
+    a tenant never runs more jobs at once than its quota. Batch jobs never
+    occupy more than `batch_workers` workers (by default all but one), so an
+    interactive job does not wait for a batch job to finish. Benchmark jobs run
+    one at a time so that they do not time each other.
+    """
+
+    def __init__(self, workers: int, default_quota: int, quotas: Optional[dict] = None,
+                 batch_workers: Optional[int] = None):
+        self.workers = workers
+        self.default_quota = default_quota
+        self.quotas = quotas or {}
+        self.batch_workers = batch_workers if batch_workers is not None else max(workers - 1, 1)
+        self._cond = threading.Condition()
+        self._flows = {}  # (tenant, priority) -> deque of ScheduledJob
+        # (tenant, priority) -> finish tag of its last job, only while it is ahead of the virtual time
+        self._last_finish = {}
+        self._virtual_time = 0.0
+        self._running = {}  # tenant -> running jobs, only tenants with some
+        self._running_batch = 0
+        self._benchmark_running = False
+        self._waits = OrderedDict()  # tenant -> recent queue waits, least recently active first
+        self._threads = []
+
+    def running_jobs(self) -> int:
+        with self._cond:
+            return sum(self._running.values())
+
+    def quota(self, tenant_id: str) -> int:
+        return self.quotas.get(tenant_id, self.default_quota)
+
+    def submit(self, tenant_id: str, priority: str, fn, cost: float = 1.0, benchmark: bool = False) -> Future:
+        future = Future()
+        flow = (tenant_id, priority)
+        with self._cond:
+            if not self._threads:
+                self._start_workers()
+            start_tag = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+            self._last_finish[flow] = start_tag + cost / PRIORITY_WEIGHTS[priority]
+            self._flows.setdefault(flow, deque()).append(
+                ScheduledJob(tenant_id, priority, start_tag, fn, future, benchmark)
+            )
+            self._cond.notify()
+        return future
+
+    def _start_workers(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"scheduler-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _pick(self) -> Optional[ScheduledJob]:
+        best_flow = None
+        for flow, jobs in self._flows.items():
+            if self._running.get(flow[0], 0) >= self.quota(flow[0]):
+                continue
+            if flow[1] == 'batch' and self._running_batch >= self.batch_workers:
+                continue
+            if jobs[0].benchmark and self._benchmark_running:
+                continue
+            if best_flow is None or jobs[0].start_tag < self._flows[best_flow][0].start_tag:
+                best_flow = flow
+        if best_flow is None:
+            return None
+        jobs = self._flows[best_flow]
+        job = jobs.popleft()
+        if not jobs:
+            del self._flows[best_flow]
+        return job
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._pick()
+                while job is None:
+                    self._cond.wait()
+                    job = self._pick()
+                if job.start_tag > self._virtual_time:
+                    self._virtual_time = job.start_tag
+                    self._prune_idle_flows()
+                self._running[job.tenant_id] = self._running.get(job.tenant_id, 0) + 1
+                if job.priority == 'batch':
+                    self._running_batch += 1
+                self._benchmark_running = self._benchmark_running or job.benchmark
+                queue_wait = time.monotonic() - job.enqueued_at
+                self._record_wait(job.tenant_id, queue_wait)
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    job.future.set_result((job.fn(), queue_wait))
+                except BaseException as e:
+                    job.future.set_exception(e)
+            with self._cond:
+                self._running[job.tenant_id] -= 1
+                if not self._running[job.tenant_id]:
+                    del self._running[job.tenant_id]
+                if job.priority == 'batch':
+                    self._running_batch -= 1
+                if job.benchmark:
+                    self._benchmark_running = False
+                if not self._flows and not self._running:
+                    # End of a busy period: every flow starts afresh from the latest finish tag
+                    self._virtual_time = max(self._last_finish.values(), default=self._virtual_time)
+                    self._last_finish.clear()
+                self._cond.notify_all()
+
+    def _prune_idle_flows(self):
+        # A flow whose last finish tag the virtual time has passed starts its next job at the
+        # virtual time, exactly as a flow that was never seen; forget it
+        idle = [flow for flow, finish in self._last_finish.items()
+                if finish <= self._virtual_time and flow not in self._flows]
+        for flow in idle:
+            del self._last_finish[flow]
+
+    def _record_wait(self, tenant_id: str, queue_wait: float):
+        waits = self._waits.get(tenant_id)
+        if waits is None:
+            waits = self._waits[tenant_id] = deque(maxlen=MAX_RECORDED_WAITS)
+            if len(self._waits) > MAX_RECORDED_TENANTS:
+                self._waits.popitem(last=False)
+        else:
+            self._waits.move_to_end(tenant_id)
+        waits.append(queue_wait)
+
+    def stats(self) -> dict:
+        """Queue length, running jobs and recent queue wait times per tenant."""
+        with self._cond:
+            queued = defaultdict(int)
+            for (tenant_id, _), jobs in self._flows.items():
+                queued[tenant_id] += len(jobs)
+            tenants = {}
+            for tenant_id in set(queued) | set(self._running) | set(self._waits):
+                waits = sorted(self._waits.get(tenant_id, ()))
+                tenants[tenant_id] = {
+                    'queued': queued.get(tenant_id, 0),
+                    'running': self._running.get(tenant_id, 0),
+                    'quota': self.quota(tenant_id),
+                    'queue_wait': {
+                        'samples': len(waits),
+                        'mean': sum(waits) / len(waits) if waits else None,
+                        'p50': waits[int(0.5 * (len(waits) - 1))] if waits else None,
+                        'p95': waits[int(0.95 * (len(waits) - 1))] if waits else None,
+                        'max': waits[-1] if waits else None
+                    }
+                }
+            return {'workers': self.workers, 'batch_workers': self.batch_workers, 'tenants': tenants}
+
+scheduler = FairScheduler(
+    SCHEDULER_WORKERS,
+    int(os.environ.get('TENANT_MAX_CONCURRENCY', SCHEDULER_WORKERS)),
+    parse_tenant_quotas(os.environ.get('TENANT_QUOTAS', '')),
+    int(os.environ['SCHEDULER_BATCH_WORKERS']) if 'SCHEDULER_BATCH_WORKERS' in os.environ else None
+)
+
+def execute_request(request: CodeExecutionRequest, tracer: Optional[Tracer] = None) -> ExecutionResponse:
+    if request.benchmark:
+        return execute_with_benchmark(request, tracer)
+    return execute_with_timeout(request.code, request.tests, request.timeout,
+                                cost_metric=request.cost_metric, isolate_tests=request.isolate_tests,
+                                harness=request.harness, tracer=tracer)
 
 @app.post("/execute", response_model=ExecutionResponse)
-async def execute_code(request: CodeExecutionRequest):
+async def execute_code(request: CodeExecutionRequest, traceparent: Optional[str] = Header(default=None)):
     if not request.code:
         raise HTTPException(status_code=400, detail="No code provided")
     if not request.tests:
         raise HTTPException(status_code=400, detail="No tests provided")
     try:
-        return execute_with_timeout(request.code, request.tests, request.timeout)
+        # A W3C traceparent header marks the request as sampled by the caller's trace
+        tracer = Tracer(traceparent is not None and TRACEPARENT_PATTERN.match(traceparent) is not None)
+        submitted = time.time()
+        # Candidate and reference both run when benchmarking against a reference
+        cost = 2.0 if request.benchmark and request.reference_code else 1.0
+        future = scheduler.submit(request.tenant_id, request.priority, lambda: execute_request(request, tracer), cost,
+                                  benchmark=request.benchmark)
+        response, queue_wait = await asyncio.wrap_future(future)
+        response.queue_wait = queue_wait
+        if tracer.enabled:
+            tracer.spans.append({'name': 'queue', 'process': 'api', 'start': submitted,
+                                 'duration': queue_wait, 'args': {'tenant_id': request.tenant_id}})
+            tracer.spans.append({'name': 'request', 'process': 'api', 'start': submitted,
+                                 'duration': time.time() - submitted, 'args': None})
+            response.trace = [TraceSpan(**span) for span in tracer.spans]
+        return response
     except Exception as e:
         # Log the error and return a generic error response
         print(f"Unexpected error during execution: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.on_event("shutdown")
+async def stop_zygotes():
+    zygote_pool.close()
+
+@app.get("/scheduler")
+async def scheduler_stats():
+    return scheduler.stats()
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
\ No newline at end of file
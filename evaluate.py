@@ -0,0 +1,206 @@
+import argparse
+import importlib
+import itertools
+import json
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Any, Optional, TextIO
+
+EVALUATORS = {
+    'mbpp': ('evaluators.mbpp', 'MBPPEvaluator'),
+    'humanevalplus': ('evaluators.humanevalplus', 'HumanEvalPlusEvaluator'),
+    'leetcode': ('evaluators.leetcode', 'LeetCodeEvaluator'),
+}
+
+
+def read_predictions(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily read predictions from a JSONL stream.
+
+    Each line is an object with `task_id`, the predicted code in `completion`
+    (or `code`), and an optional `sample` index for pass@k style runs.
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        code = record.get('completion', record.get('code')) if isinstance(record, dict) else None
+        if code is None or 'task_id' not in record:
+            print(f"Warning: Skipping line {line_number}, expected a JSON object with task_id and completion/code")
+            continue
+        yield {'task_id': record['task_id'], 'code': code, 'sample': record.get('sample', 0)}
+
+
+def resolve_task_id(task_id: Any, test_cases: Dict[Any, Any]) -> Optional[Any]:
+    """Match a task id read from JSON against the dataset's keys (MBPP uses ints)."""
+    if task_id in test_cases:
+        return task_id
+    if isinstance(task_id, str) and task_id.isdigit() and int(task_id) in test_cases:
+        return int(task_id)
+    return None
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate streamed predictions against a benchmark.")
+    parser.add_argument('--benchmark', required=True, choices=sorted(EVALUATORS))
+    parser.add_argument('--predictions', default='-',
+                        help="JSONL file with one prediction per line, '-' for stdin (default)")
+    parser.add_argument('--api-url', action='append', dest='api_urls',
+                        help="Execution endpoint, repeat to spread tasks over several (default: http://localhost:1337/execute)")
+    parser.add_argument('--concurrency', type=int, default=4, help="Tasks evaluated at the same time")
+    parser.add_argument('--tenant-id', default='default', help="Tenant the API schedules this run's jobs under")
+    parser.add_argument('--priority', default='batch', choices=['interactive', 'batch'])
+    parser.add_argument('--output', help="JSONL file the task reports are streamed to (default: <benchmark>_task_reports.jsonl)")
+    parser.add_argument('--summary', help="Also save the summary to this JSON file")
+    parser.add_argument('--efficiency', action='store_true', help="Benchmark passing solutions against the reference")
+    parser.add_argument('--cost-metric', choices=['instructions', 'lines'])
+    parser.add_argument('--result-store', help="Also record per-test rows in this columnar store directory")
+    parser.add_argument('--run-id', help="Run id in the result store (default: the benchmark name)")
+    parser.add_argument('--trace', help="Trace requests through the API into this Chrome trace JSON file")
+    parser.add_argument('--record-cases', action='store_true',
+                        help="Record the failing inputs of each candidate, to build a test profile from (humanevalplus)")
+    parser.add_argument('--case-profile', help="Test profile JSON to order inputs and fast-reject with (humanevalplus)")
+    args = parser.parse_args(argv)
+    if (args.record_cases or args.case_profile) and args.benchmark != 'humanevalplus':
+        parser.error("--record-cases and --case-profile are only supported for humanevalplus")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    api_urls = args.api_urls or ["http://localhost:1337/execute"]
+    output_file = args.output or f"{args.benchmark}_task_reports.jsonl"
+
+    module_name, class_name = EVALUATORS[args.benchmark]
+    evaluator = getattr(importlib.import_module(module_name), class_name)(
+        api_url=api_urls[0], tenant_id=args.tenant_id, priority=args.priority
+    )
+
+    result_store = None
+    if args.result_store:
+        from evaluators.result_store import ResultStore
+        result_store = ResultStore(args.result_store, args.run_id or args.benchmark, benchmark=args.benchmark)
+
+    task_options = {}
+    if args.record_cases:
+        task_options['record_cases'] = True
+    if args.case_profile:
+        from evaluators.case_profile import load_case_profile
+        task_options['case_profile'] = load_case_profile(args.case_profile)
+
+    trace_recorder = None
+    if args.trace:
+        from evaluators.tracing import TraceRecorder
+        trace_recorder = TraceRecorder(args.trace)
+
+    totals = {'total_tasks': 0, 'passed_tasks': 0, 'failed_tasks': 0}
+    if args.case_profile:
+        totals['fast_rejected'] = 0
+    error_types = defaultdict(int)
+    # Only what the efficiency and cost summaries need is kept per task
+    measured_reports = []
+    lock = threading.Lock()
+    # Bounds the predictions held in memory to those being evaluated or queued
+    in_flight = threading.BoundedSemaphore(2 * args.concurrency)
+
+    predictions = sys.stdin if args.predictions == '-' else open(args.predictions)
+    try:
+        with open(output_file, 'w') as output, ThreadPoolExecutor(args.concurrency) as executor:
+            def record(future, task_id, sample):
+                try:
+                    task_report, task_errors = future.result()
+                except Exception as e:
+                    # Counted as a failed task, so the totals cover every prediction
+                    print(f"Error evaluating task {task_id}: {str(e)}")
+                    task_report = {
+                        'task_id': task_id,
+                        'verdict': "At least one test failed",
+                        'test_results': [{'task_id': task_id, 'verdict': "EvaluationError", 'error': str(e)}],
+                        'passed': False
+                    }
+                    task_errors = {'EvaluationError': 1}
+                finally:
+                    in_flight.release()
+                with lock:
+                    totals['total_tasks'] += 1
+                    totals['passed_tasks' if task_report['passed'] else 'failed_tasks'] += 1
+                    if task_report.get('fast_rejected'):
+                        totals['fast_rejected'] += 1
+                    for error_type, count in task_errors.items():
+                        error_types[error_type] += count
+                    if args.efficiency or args.cost_metric:
+                        measured_reports.append({key: task_report.get(key) for key in ('passed', 'cost', 'efficiency')})
+                    output.write(json.dumps({**task_report, 'sample': sample}) + "\n")
+
+            endpoints = itertools.cycle(api_urls)
+            for prediction in read_predictions(predictions):
+                task_id = resolve_task_id(prediction['task_id'], evaluator.test_cases)
+                if task_id is None:
+                    print(f"Warning: Task {prediction['task_id']} not found in dataset")
+                    continue
+                in_flight.acquire()
+                future = executor.submit(
+                    evaluator.evaluate_task, task_id, prediction['code'],
+                    efficiency=args.efficiency, cost_metric=args.cost_metric, result_store=result_store,
+                    sample=prediction['sample'], api_url=next(endpoints), trace_recorder=trace_recorder,
+                    **task_options
+                )
+                future.add_done_callback(
+                    lambda future, task_id=task_id, sample=prediction['sample']: record(future, task_id, sample)
+                )
+    finally:
+        if predictions is not sys.stdin:
+            predictions.close()
+        if result_store is not None:
+            result_store.close()
+        if trace_recorder is not None:
+            trace_recorder.close()
+
+    summary = {
+        **totals,
+        'pass_rate': totals['passed_tasks'] / totals['total_tasks'] if totals['total_tasks'] > 0 else 0,
+        'error_distribution': dict(error_types)
+    }
+    if args.efficiency:
+        from evaluators.efficiency import summarize_efficiency
+        summary['efficiency'] = summarize_efficiency(measured_reports)
+    if args.cost_metric:
+        from evaluators.efficiency import summarize_cost
+        summary['cost'] = summarize_cost(measured_reports, args.cost_metric)
+    if trace_recorder is not None:
+        summary['latency'] = trace_recorder.summarize()
+
+    print("\n=== Evaluation Summary ===")
+    print(f"Total Tasks: {summary['total_tasks']}")
+    print(f"Passed Tasks: {summary['passed_tasks']}")
+    print(f"Failed Tasks: {summary['failed_tasks']}")
+    print(f"Pass Rate: {summary['pass_rate']:.2%}")
+    if args.case_profile:
+        print(f"Fast Rejected: {summary['fast_rejected']}")
+
+    print("\nError Distribution:")
+    for error_type, count in summary['error_distribution'].items():
+        print(f"- {error_type}: {count}")
+
+    if trace_recorder is not None:
+        print("\nSlowest Tasks:")
+        for task in summary['latency']['slowest_tasks']:
+            stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in list(task['stages'].items())[:5])
+            print(f"- {task['task_id']}#{task['sample']}: {task['total']:.3f}s ({stages})")
+        print(f"Trace saved to {args.trace}")
+
+    print(f"\nTask reports saved to {output_file}")
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary saved to {args.summary}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,8 @@
-from typing import Dict, List, Any
-from datasets import load_dataset
-from collections import defaultdict
-from tqdm import tqdm
 from evaluators.humanevalplus import HumanEvalPlusEvaluator
 
 def main():
+    from datasets import load_dataset
+
     # Example usage
     evaluator = HumanEvalPlusEvaluator()
     
@@ -1,10 +1,8 @@
-from typing import Dict, List, Any
-from datasets import load_dataset
-from collections import defaultdict
-from tqdm import tqdm
 from evaluators.mbpp import MBPPEvaluator
 
 def main():
+    from datasets import load_dataset
+
     # Example usage
     evaluator = MBPPEvaluator()
     
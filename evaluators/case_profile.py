@@ -0,0 +1,193 @@
+import ast
+import json
+import re
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+CASE_TEST_PATTERN = re.compile(r'^check_cases\(\w+, \[(\d+)\]\)$')
+
+
+def split_check_harness(test_code: str) -> Optional[Tuple[str, int]]:
+    """
+    Make a HumanEval+ `check` harness runnable on chosen inputs.
+
+    HumanEval+ harnesses define `check(candidate)` as a few table assignments
+    (`inputs = [...]`, `results = [...]`) followed by one
+    `for i, (inp, exp) in enumerate(zip(inputs, results)):` loop. This appends
+    `check_cases(candidate, indices)`, which runs the same loop body for the
+    given input indices only. The tables are built once when the harness is
+    executed, not on every call.
+
+    Returns:
+        The extended harness and the number of inputs, or None if `check` does
+        not have that shape
+    """
+    try:
+        module = ast.parse(test_code)
+    except SyntaxError:
+        return None
+    check = next((node for node in module.body if isinstance(node, ast.FunctionDef) and node.name == 'check'), None)
+    if check is None or len(check.args.args) != 1 or not check.body:
+        return None
+    candidate = check.args.args[0].arg
+    *prefix, loop = check.body
+    if not isinstance(loop, ast.For) or loop.orelse:
+        return None
+
+    # The loop must iterate over enumerate(zip(<tables>)) with tables assigned before it
+    iterator = loop.iter
+    if not (isinstance(iterator, ast.Call) and isinstance(iterator.func, ast.Name) and iterator.func.id == 'enumerate'
+            and len(iterator.args) == 1 and not iterator.keywords):
+        return None
+    zipped = iterator.args[0]
+    if not (isinstance(zipped, ast.Call) and isinstance(zipped.func, ast.Name) and zipped.func.id == 'zip'
+            and zipped.args and not zipped.keywords and all(isinstance(arg, ast.Name) for arg in zipped.args)):
+        return None
+
+    tables = {}
+    for statement in prefix:
+        if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                and isinstance(statement.targets[0], ast.Name)):
+            return None
+        if any(isinstance(node, ast.Name) and node.id == candidate for node in ast.walk(statement)):
+            return None
+        tables[statement.targets[0].id] = statement.value
+    lengths = []
+    for arg in zipped.args:
+        table = tables.get(arg.id)
+        if not isinstance(table, (ast.List, ast.Tuple)):
+            return None
+        lengths.append(len(table.elts))
+    # The tables become closure variables, the loop body must not rebind them
+    for statement in loop.body:
+        for node in ast.walk(statement):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store) and node.id in tables:
+                return None
+
+    index = ast.Name('_case', ast.Load())
+    cases = ast.GeneratorExp(
+        elt=ast.Tuple([index, ast.Tuple([ast.Subscript(ast.Name(arg.id, ast.Load()), index, ast.Load())
+                                         for arg in zipped.args], ast.Load())], ast.Load()),
+        generators=[ast.comprehension(ast.Name('_case', ast.Store()), ast.Name('indices', ast.Load()), [], 0)]
+    )
+    check_cases = ast.FunctionDef(
+        name='check_cases',
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(candidate), ast.arg('indices')], kwonlyargs=[],
+                           kw_defaults=[], defaults=[]),
+        body=[ast.For(target=loop.target, iter=cases, body=loop.body, orelse=[])],
+        decorator_list=[],
+        returns=None
+    )
+    factory = ast.FunctionDef(
+        name='_make_check_cases',
+        args=ast.arguments(posonlyargs=[], args=[], kwonlyargs=[], kw_defaults=[], defaults=[]),
+        body=[*prefix, check_cases, ast.Return(ast.Name('check_cases', ast.Load()))],
+        decorator_list=[],
+        returns=None
+    )
+    generated = ast.Module(body=[
+        factory,
+        ast.Assign([ast.Name('check_cases', ast.Store())], ast.Call(ast.Name('_make_check_cases', ast.Load()), [], []))
+    ], type_ignores=[])
+    return f"{test_code}\n\n{ast.unparse(ast.fix_missing_locations(generated))}\n", min(lengths)
+
+
+def build_case_profile(task_reports: Iterable[Dict[str, Any]], max_subset: int = 8) -> Dict[str, Any]:
+    """
+    Build a per-task test profile from historical per-input failures.
+
+    Args:
+        task_reports: Task reports of runs with `record_cases=True`, from any
+            number of runs and models
+        max_subset: Largest fast-reject subset per task
+
+    Returns:
+        Dict mapping task id to the number of inputs, how many of the observed
+        candidates failed, how often each input failed, the fast-reject subset
+        and the order to run all inputs in
+    """
+    num_cases = {}
+    failing = defaultdict(list)
+    candidates = defaultdict(int)
+    for report in task_reports:
+        if report.get('case_failures') is None:
+            continue
+        task_id = report['task_id']
+        if num_cases.setdefault(task_id, report['num_cases']) != report['num_cases']:
+            continue  # recorded against another version of the dataset
+        candidates[task_id] += 1
+        if report['case_failures']:
+            failing[task_id].append(set(report['case_failures']))
+
+    profile = {}
+    for task_id, count in num_cases.items():
+        failure_counts = [0] * count
+        for failures in failing[task_id]:
+            for case in failures:
+                failure_counts[case] += 1
+
+        # Greedy set cover: each pick rejects the most failing candidates not yet rejected
+        uncovered = list(failing[task_id])
+        subset = []
+        while uncovered and len(subset) < max_subset:
+            coverage = defaultdict(int)
+            for failures in uncovered:
+                for case in failures:
+                    coverage[case] += 1
+            case = min(coverage, key=lambda case: (-coverage[case], -failure_counts[case], case))
+            subset.append(case)
+            uncovered = [failures for failures in uncovered if case not in failures]
+
+        chosen = set(subset)
+        rest = sorted((case for case in range(count) if case not in chosen),
+                      key=lambda case: (-failure_counts[case], case))
+        profile[task_id] = {
+            'num_cases': count,
+            'candidates': candidates[task_id],
+            'failing_candidates': len(failing[task_id]),
+            'failure_counts': failure_counts,
+            'reject_subset': subset,
+            'order': subset + rest
+        }
+    return profile
+
+
+def case_profile_from_result_store(root: str, run_ids: Optional[Iterable[str]] = None,
+                                   benchmark: str = 'humanevalplus', max_subset: int = 8) -> Dict[str, Any]:
+    """Build a test profile from the per-input rows of `record_cases` runs in a result store."""
+    from evaluators.result_store import read_results
+
+    table = read_results(root, ['run_id', 'task_id', 'sample', 'test', 'passed'], run_ids, benchmark)
+
+    outcomes = defaultdict(dict)
+    for run_id, task_id, sample, test, passed in zip(*(table[column].to_pylist() for column in
+                                                       ['run_id', 'task_id', 'sample', 'test', 'passed'])):
+        match = CASE_TEST_PATTERN.match(test)
+        if match:
+            outcomes[(run_id, task_id, sample)][int(match.group(1))] = passed
+
+    # Recorded candidates ran every input; fewer rows are a timeout, which hides which
+    # inputs failed, or a fast-reject subset of a single input
+    num_cases = defaultdict(int)
+    for (_, task_id, _), cases in outcomes.items():
+        num_cases[task_id] = max(num_cases[task_id], len(cases))
+    task_reports = []
+    for (_, task_id, _), cases in outcomes.items():
+        if len(cases) != num_cases[task_id] or len(cases) != max(cases) + 1:
+            continue
+        task_reports.append({
+            'task_id': task_id,
+            'num_cases': len(cases),
+            'case_failures': sorted(case for case, passed in cases.items() if not passed)
+        })
+    return build_case_profile(task_reports, max_subset)
+
+
+def save_case_profile(profile: Dict[str, Any], path: str):
+    with open(path, 'w') as f:
+        json.dump(profile, f)
+
+
+def load_case_profile(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
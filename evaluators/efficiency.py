@@ -0,0 +1,83 @@
+import math
+from typing import Dict, List, Any, Iterable, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linearly interpolated percentile of `values`, q in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {f"p{q}": percentile(values, q) for q in (10, 25, 50, 75, 90, 99)}
+
+
+def summarize_efficiency(task_reports: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate per-task efficiency measurements into benchmark-level statistics.
+
+    Args:
+        task_reports: Task reports carrying the API's `efficiency` result
+
+    Returns:
+        Dict with speedup over the reference and ratio percentile distributions
+    """
+    runtime_ratios = []
+    memory_ratios = []
+    errors = 0
+    for report in task_reports:
+        efficiency = report.get('efficiency')
+        if not efficiency:
+            continue
+        if efficiency.get('runtime_ratio'):
+            runtime_ratios.append(efficiency['runtime_ratio'])
+        elif efficiency.get('error'):
+            errors += 1
+        if efficiency.get('memory_ratio'):
+            memory_ratios.append(efficiency['memory_ratio'])
+
+    summary = {
+        'measured_tasks': len(runtime_ratios),
+        'benchmark_errors': errors,
+        'speedup_geomean': None,
+        'faster_than_reference': sum(1 for ratio in runtime_ratios if ratio < 1),
+        'runtime_ratio': _distribution(runtime_ratios),
+        'memory_ratio': _distribution(memory_ratios)
+    }
+    if runtime_ratios:
+        # Speedup is reference / candidate, so invert the geometric mean ratio
+        mean_log_ratio = sum(math.log(ratio) for ratio in runtime_ratios) / len(runtime_ratios)
+        summary['speedup_geomean'] = math.exp(-mean_log_ratio)
+    return summary
+
+
+def summarize_cost(task_reports: Iterable[Dict[str, Any]], cost_metric: str) -> Dict[str, Any]:
+    """
+    Aggregate per-task instruction or line-event counts.
+
+    Only passing tasks are included, since a failing solution stops early and
+    its count is not comparable.
+
+    Args:
+        task_reports: Task reports carrying a `cost` total
+        cost_metric: The metric the counts were collected with
+
+    Returns:
+        Dict with the total and the distribution of per-task counts
+    """
+    costs = [report['cost'] for report in task_reports
+             if report.get('passed') and report.get('cost') is not None]
+    return {
+        'metric': cost_metric,
+        'measured_tasks': len(costs),
+        'total': sum(costs),
+        'mean': sum(costs) / len(costs) if costs else None,
+        'distribution': _distribution(costs)
+    }
@@ -2,22 +2,30 @@ import json
 import ast
 import io
 import sys
-from typing import Dict, List, Any, Tuple
-from datasets import load_dataset
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 from collections import defaultdict
 import time
-from tqdm import tqdm
 import re
 import ast
-import numpy as np
 from requests.exceptions import ConnectionError
+from evaluators.efficiency import summarize_efficiency, summarize_cost
+from evaluators.result_store import ResultStore
+from evaluators.tracing import TraceRecorder, post_execute
+from evaluators.case_profile import split_check_harness
 
 class HumanEvalPlusEvaluator:
-    def __init__(self, api_url: str = "http://localhost:1337/execute"):
+    def __init__(self, api_url: str = "http://localhost:1337/execute", tenant_id: str = "default",
+                 priority: str = "batch"):
+        from datasets import load_dataset
+
         self.api_url = api_url
+        # Sent with every request so the API can schedule this run fairly against others
+        self.tenant_id = tenant_id
+        self.priority = priority
         self.dataset = load_dataset("evalplus/humanevalplus")
         self.test_cases = self._prepare_test_cases()
+        self._case_harnesses = {}
         
     def _prepare_test_cases(self) -> Dict[str, Dict[str, Any]]:
         """Extract test cases and setup code from the dataset."""
@@ -25,73 +33,132 @@ class HumanEvalPlusEvaluator:
         for item in self.dataset['test']:
             test_cases[item['task_id']] = {
                 'entry_point': item['entry_point'],
-                'test_code': item['test']
+                'test_code': item['test'],
+                'reference_code': item['prompt'] + item['canonical_solution']
             }
         return test_cases
 
-    def evaluate_predictions(self, predictions: Dict[str, str]) -> Dict[str, Any]:
+    def _case_harness(self, task_id: Any) -> Optional[Tuple[str, int]]:
+        """Harness of a task extended to run chosen inputs, see `split_check_harness`."""
+        if task_id not in self._case_harnesses:
+            self._case_harnesses[task_id] = split_check_harness(self.test_cases[task_id]['test_code'])
+        return self._case_harnesses[task_id]
+
+    def evaluate_task(self, task_id: Any, code: str, efficiency: bool = False,
+                      cost_metric: Optional[str] = None, result_store: Optional[ResultStore] = None,
+                      sample: int = 0, api_url: Optional[str] = None,
+                      trace_recorder: Optional[TraceRecorder] = None, case_profile: Optional[Dict[str, Any]] = None,
+                      record_cases: bool = False) -> Tuple[Dict[str, Any], Dict[str, int]]:
         """
-        Evaluate predictions against HumanEvalPlus test cases.
-        
+        Evaluate a single prediction against its HumanEvalPlus test cases.
+
         Args:
-            predictions: Dict mapping task_id to predicted code
-            
+            task_id: Task to evaluate, must be in `test_cases`
+            code: Predicted code
+            efficiency: Also benchmark a passing solution against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            sample: Index of this prediction among the task's samples
+            api_url: Execution endpoint to use instead of `self.api_url`
+            trace_recorder: Trace the task's requests through the API and worker into this recorder
+            case_profile: Test profile from `build_case_profile`; inputs that fail often run first,
+                after a fast-reject subset of them
+            record_cases: Run each input of the harness as its own test and record the failing ones,
+                to build a test profile from
+
         Returns:
-            Dict containing evaluation metrics and detailed reports
+            Task report and the count of each error type it produced
         """
-        results = {
-            'total_tasks': len(predictions),
-            'passed_tasks': 0,
-            'failed_tasks': 0,
-            'error_types': defaultdict(int),
-            'task_reports': {},
-            'summary': {}
-        }
-        
-        for task_id, code in tqdm(predictions.items(), desc="Evaluating tasks"):
-            if task_id not in self.test_cases:
-                print(f"Warning: Task {task_id} not found in dataset")
-                continue
-                
-            task_data = self.test_cases[task_id]
-            entry_point = task_data['entry_point']
-            test_code = task_data['test_code']
-            task_results = []
-            all_passed = True
-            
+        api_url = api_url or self.api_url
+        trace = trace_recorder.start_task(task_id, sample) if trace_recorder is not None else None
+        error_types = defaultdict(int)
+        task_data = self.test_cases[task_id]
+        entry_point = task_data['entry_point']
+        test_code = task_data['test_code']
+        task_results = []
+        all_passed = True
+
+        harness = test_code
+        plain_check = [f"check({entry_point})"]
+        stages = [plain_check]
+        fast_reject = False
+        num_cases = None
+        case_failures = None
+        if record_cases or case_profile is not None:
+            split = self._case_harness(task_id)
+            if split is not None:
+                harness, num_cases = split
+                task_profile = case_profile.get(task_id) if case_profile is not None else None
+                if record_cases:
+                    # One test per input, so the inputs this candidate fails on are known
+                    stages = [[f"check_cases({entry_point}, [{case}])" for case in range(num_cases)]]
+                elif task_profile is not None and task_profile['num_cases'] == num_cases:
+                    # Inputs that failed most often run first. A candidate that passes the
+                    # fast-reject subset still runs every input, so its verdict is the full run's
+                    stages = [[f"check_cases({entry_point}, {task_profile['order']})"]]
+                    if task_profile['reject_subset']:
+                        stages.insert(0, [f"check_cases({entry_point}, {task_profile['reject_subset']})"])
+                        fast_reject = True
+                if efficiency or cost_metric:
+                    # Benchmarks and cost are measured on the plain `check`, as in runs without a
+                    # profile: check_cases reuses tables built once, which the candidate may mutate
+                    if not record_cases:
+                        stages.pop()
+                    stages.append(plain_check)
+
+        for stage, tests in enumerate(stages):
+            final = stage == len(stages) - 1
             retries = 3
             while retries > 0:
                 try:
-                    # Construct the full test script
-                    full_code = f"{code}\n\n{test_code}\n"
-                    response = requests.post(
-                        self.api_url,
-                        json={
-                            "code": full_code,
-                            "tests": [f"check({entry_point})"],
-                            "timeout": 20
-                        }
-                    )
-                    response.raise_for_status()
-                    result = response.json()
-                    
+                    # The harness runs after the code; the API sets it up once per task
+                    payload = {
+                        "code": code,
+                        "harness": harness,
+                        "tests": tests,
+                        "timeout": 20,
+                        "tenant_id": self.tenant_id,
+                        "priority": self.priority
+                    }
+                    if cost_metric and final:
+                        payload["cost_metric"] = cost_metric
+                    if efficiency and final:
+                        payload["benchmark"] = True
+                        payload["reference_code"] = task_data['reference_code']
+                    result = post_execute(api_url, payload, trace)
+
+                    failed = next((detail for detail in result['details'] if detail['status'] == "failed"),
+                                  result['details'][0])
                     test_result = {
                         'task_id': task_id,
                         'verdict': "All tests passed" if result['verdict'] == "All tests passed" else "At least one test failed",
-                        'error': None if result['verdict'] == "All tests passed" else result['details'][0]['traceback']
+                        'error': None if result['verdict'] == "All tests passed" else failed['traceback'],
+                        'efficiency': result.get('efficiency'),
+                        'cost': sum(detail.get('cost') or 0 for detail in result['details'])
                     }
-                    
-                    if not test_result['verdict'] == "All tests passed":
+                    passed = test_result['verdict'] == "All tests passed"
+                    if record_cases and stage == 0 and len(result['details']) == num_cases:
+                        case_failures = [case for case, detail in enumerate(result['details'])
+                                         if detail['status'] == "failed"]
+                    if result_store is not None and not (fast_reject and stage == 0 and passed):
+                        # A fast-reject subset that passed is run again by the full suite
+                        result_store.add_response(task_id, result, sample)
+
+                    if not passed:
                         all_passed = False
-                        results['error_types'][result['details'][0]['error_type']] += 1
-                    
+                        error_types[failed['error_type']] += 1
+                    elif not final:
+                        break  # passed an earlier stage, go on to the next one
+
                     task_results.append(test_result)
                     break  # Exit the retry loop if successful
                 except ConnectionError:
                     retries -= 1
                     if retries == 0:
                         print(f"Error: Unable to connect to the server for task {task_id} after 3 attempts.")
-                        results['error_types']['ConnectionError'] += 1
+                        error_types['ConnectionError'] += 1
+                        if result_store is not None:
+                            result_store.add(task_id, '<request>', False, 'ConnectionError', sample=sample)
                         task_results.append({
                             'task_id': task_id,
                             'verdict': "ConnectionError",
@@ -104,27 +171,90 @@ class HumanEvalPlusEvaluator:
                     retries -= 1
                     if retries == 0:
                         print(f"Error evaluating test case for task {task_id}: {str(e)}")
-                        results['error_types']['EvaluationError'] += 1
+                        error_types['EvaluationError'] += 1
+                        if result_store is not None:
+                            result_store.add(task_id, '<request>', False, 'EvaluationError', str(e), sample=sample)
                         all_passed = False
                         task_results.append({
                             'task_id': task_id,
                             'verdict': "EvaluationError",
                             'error': str(e)
                         })
+            if task_results:
+                break  # the verdict is decided, skip the remaining stages
+
+        task_report = {
+            'task_id': task_id,
+            'verdict': "All tests passed" if all_passed else "At least one test failed",
+            'test_results': task_results,
+            'passed': all_passed
+        }
+        if efficiency:
+            task_report['efficiency'] = task_results[0].get('efficiency') if task_results else None
+        if cost_metric:
+            task_report['cost'] = task_results[0].get('cost') if task_results else None
+        if fast_reject:
+            task_report['fast_rejected'] = stage == 0 and not all_passed
+        if record_cases:
+            task_report['num_cases'] = num_cases
+            task_report['case_failures'] = case_failures
+
+        if trace is not None:
+            trace_recorder.finish_task(trace)
+
+        return task_report, dict(error_types)
+
+    def evaluate_predictions(self, predictions: Dict[str, str], efficiency: bool = False,
+                             cost_metric: Optional[str] = None,
+                             result_store: Optional[ResultStore] = None,
+                             trace_recorder: Optional[TraceRecorder] = None,
+                             case_profile: Optional[Dict[str, Any]] = None,
+                             record_cases: bool = False) -> Dict[str, Any]:
+        """
+        Evaluate predictions against HumanEvalPlus test cases.
+        
+        Args:
+            predictions: Dict mapping task_id to predicted code
+            efficiency: Also benchmark passing solutions against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            trace_recorder: Trace requests into this recorder and summarize the slowest tasks
+            case_profile: Test profile to order inputs by and fast-reject failing candidates with
+            record_cases: Record each candidate's failing inputs, to build a test profile from
             
+        Returns:
+            Dict containing evaluation metrics and detailed reports
+        """
+        from tqdm import tqdm
+
+        results = {
+            'total_tasks': len(predictions),
+            'passed_tasks': 0,
+            'failed_tasks': 0,
+            'error_types': defaultdict(int),
+            'task_reports': {},
+            'summary': {}
+        }
+        
+        for task_id, code in tqdm(predictions.items(), desc="Evaluating tasks"):
+            if task_id not in self.test_cases:
+                print(f"Warning: Task {task_id} not found in dataset")
+                continue
+
+            task_report, task_errors = self.evaluate_task(
+                task_id, code, efficiency=efficiency, cost_metric=cost_metric, result_store=result_store,
+                trace_recorder=trace_recorder, case_profile=case_profile, record_cases=record_cases
+            )
+            for error_type, count in task_errors.items():
+                results['error_types'][error_type] += count
+
             # Update task report
-            if all_passed:
+            if task_report['passed']:
                 results['passed_tasks'] += 1
             else:
                 results['failed_tasks'] += 1
-                
-            results['task_reports'][task_id] = {
-                'task_id': task_id,
-                'verdict': "All tests passed" if all_passed else "At least one test failed",
-                'test_results': task_results,
-                'passed': all_passed
-            }
-        
+            results['task_reports'][task_id] = task_report
+
         # Calculate summary statistics
         results['summary'] = {
             'total_tasks': results['total_tasks'],
@@ -133,7 +263,19 @@ class HumanEvalPlusEvaluator:
             'pass_rate': results['passed_tasks'] / results['total_tasks'] if results['total_tasks'] > 0 else 0,
             'error_distribution': dict(results['error_types'])
         }
-        
+        if efficiency:
+            results['summary']['efficiency'] = summarize_efficiency(results['task_reports'].values())
+        if cost_metric:
+            results['summary']['cost'] = summarize_cost(results['task_reports'].values(), cost_metric)
+        if result_store is not None:
+            result_store.flush()
+        if trace_recorder is not None:
+            results['summary']['latency'] = trace_recorder.summarize()
+        if case_profile is not None:
+            results['summary']['fast_rejected'] = sum(
+                1 for report in results['task_reports'].values() if report.get('fast_rejected')
+            )
+
         return results
 
     def save_report(self, results: Dict[str, Any], output_file: str):
@@ -1,15 +1,22 @@
 import json
 import requests
-from typing import Dict, Any
-from datasets import load_dataset
+from typing import Dict, Any, Optional, Tuple
 from collections import defaultdict
-from tqdm import tqdm
 from requests.exceptions import ConnectionError
+from evaluators.efficiency import summarize_efficiency, summarize_cost
+from evaluators.result_store import ResultStore
+from evaluators.tracing import TraceRecorder, post_execute
 import time
 
 class LeetCodeEvaluator:
-    def __init__(self, api_url: str = "http://localhost:1337/execute"):
+    def __init__(self, api_url: str = "http://localhost:1337/execute", tenant_id: str = "default",
+                 priority: str = "batch"):
+        from datasets import load_dataset
+
         self.api_url = api_url
+        # Sent with every request so the API can schedule this run fairly against others
+        self.tenant_id = tenant_id
+        self.priority = priority
         self.dataset = load_dataset("newfacade/LeetCodeDataset")
         self.test_cases = self._prepare_test_cases()
         
@@ -20,20 +27,141 @@ class LeetCodeEvaluator:
             test_cases[item['task_id']] = {
                 'entry_point': item['entry_point'],
                 'test_code': f"{item['test']}",
-                'prompt': item['prompt']
+                'prompt': item['prompt'],
+                'reference_code': item['completion']
             }
         return test_cases
 
-    def evaluate_predictions(self, predictions: Dict[str, str]) -> Dict[str, Any]:
+    def evaluate_task(self, task_id: Any, code: str, efficiency: bool = False,
+                      cost_metric: Optional[str] = None, result_store: Optional[ResultStore] = None,
+                      sample: int = 0, api_url: Optional[str] = None,
+                      trace_recorder: Optional[TraceRecorder] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Evaluate a single prediction against its LeetCode test cases.
+
+        Args:
+            task_id: Task to evaluate, must be in `test_cases`
+            code: Predicted code
+            efficiency: Also benchmark a passing solution against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            sample: Index of this prediction among the task's samples
+            api_url: Execution endpoint to use instead of `self.api_url`
+            trace_recorder: Trace the task's requests through the API and worker into this recorder
+
+        Returns:
+            Task report and the count of each error type it produced
+        """
+        api_url = api_url or self.api_url
+        trace = trace_recorder.start_task(task_id, sample) if trace_recorder is not None else None
+        error_types = defaultdict(int)
+        task_data = self.test_cases[task_id]
+        entry_point = task_data['entry_point']
+        test_code = task_data['test_code']
+        prompt = task_data['prompt']
+        task_results = []
+        all_passed = True
+
+        retries = 3
+        while retries > 0:
+            try:
+                # The harness runs after the code; the API sets it up once per task
+                payload = {
+                    "code": f"{prompt}\n\n{code}\n",
+                    "harness": test_code,
+                    "tests": [f"check({entry_point})"],
+                    "timeout": 80,
+                    "tenant_id": self.tenant_id,
+                    "priority": self.priority
+                }
+                if cost_metric:
+                    payload["cost_metric"] = cost_metric
+                if efficiency:
+                    payload["benchmark"] = True
+                    payload["reference_code"] = f"{prompt}\n\n{task_data['reference_code']}\n"
+
+                result = post_execute(api_url, payload, trace)
+
+                test_result = {
+                    'task_id': task_id,
+                    'verdict': "All tests passed" if result['verdict'] == "All tests passed" else "At least one test failed",
+                    'error': None if result['verdict'] == "All tests passed" else result['details'][0]['traceback'],
+                    'efficiency': result.get('efficiency'),
+                    'cost': sum(detail.get('cost') or 0 for detail in result['details'])
+                }
+
+                if not test_result['verdict'] == "All tests passed":
+                    all_passed = False
+                    error_types[result['details'][0]['error_type']] += 1
+
+                task_results.append(test_result)
+                if result_store is not None:
+                    result_store.add_response(task_id, result, sample)
+                break  # Exit the retry loop if successful
+            except ConnectionError:
+                retries -= 1
+                if retries == 0:
+                    print(f"Error: Unable to connect to the server for task {task_id} after 3 attempts.")
+                    error_types['ConnectionError'] += 1
+                    if result_store is not None:
+                        result_store.add(task_id, '<request>', False, 'ConnectionError', sample=sample)
+                    task_results.append({
+                        'task_id': task_id,
+                        'verdict': "ConnectionError",
+                        'error': 'ConnectionError: Unable to connect to the server after 3 attempts.'
+                    })
+                else:
+                    print(f"Connection error for task {task_id}. Retrying in 10 seconds...")
+                    time.sleep(10)
+            except Exception as e:
+                retries -= 1
+                if retries == 0:
+                    print(f"Error evaluating test case for task {task_id}: {str(e)}")
+                    error_types['EvaluationError'] += 1
+                    if result_store is not None:
+                        result_store.add(task_id, '<request>', False, 'EvaluationError', str(e), sample=sample)
+                    all_passed = False
+                    task_results.append({
+                        'task_id': task_id,
+                        'verdict': "EvaluationError",
+                        'error': str(e)
+                    })
+
+        task_report = {
+            'task_id': task_id,
+            'verdict': "All tests passed" if all_passed else "At least one test failed",
+            'test_results': task_results,
+            'passed': all_passed
+        }
+        if efficiency:
+            task_report['efficiency'] = task_results[0].get('efficiency') if task_results else None
+        if cost_metric:
+            task_report['cost'] = task_results[0].get('cost') if task_results else None
+
+        if trace is not None:
+            trace_recorder.finish_task(trace)
+
+        return task_report, dict(error_types)
+
+    def evaluate_predictions(self, predictions: Dict[str, str], efficiency: bool = False,
+                             cost_metric: Optional[str] = None,
+                             result_store: Optional[ResultStore] = None,
+                             trace_recorder: Optional[TraceRecorder] = None) -> Dict[str, Any]:
         """
         Evaluate predictions against LeetCode test cases.
         
         Args:
             predictions: Dict mapping task-id to predicted code
+            efficiency: Also benchmark passing solutions against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            trace_recorder: Trace requests into this recorder and summarize the slowest tasks
             
         Returns:
             Dict containing evaluation metrics and detailed reports
         """
+        from tqdm import tqdm
+
         results = {
             'total_tasks': len(predictions),
             'passed_tasks': 0,
@@ -47,81 +175,21 @@ class LeetCodeEvaluator:
             if task_id not in self.test_cases:
                 print(f"Warning: Task {task_id} not found in dataset")
                 continue
-                
-            task_data = self.test_cases[task_id]
-            entry_point = task_data['entry_point']
-            test_code = task_data['test_code']
-            prompt = task_data['prompt']
-            task_results = []
-            all_passed = True
-            
-            retries = 3
-            while retries > 0:
-                try:
-                    # Construct the full test script
-                    full_code = f"{prompt}\n\n{code}\n\n{test_code}\n"
-                    
-                    response = requests.post(
-                        self.api_url,
-                        json={
-                            "code": full_code,
-                            "tests": [f"check({entry_point})"],
-                            "timeout": 80
-                        }
-                    )
-                    response.raise_for_status()
-                    result = response.json()
-                    
-                    test_result = {
-                        'task_id': task_id,
-                        'verdict': "All tests passed" if result['verdict'] == "All tests passed" else "At least one test failed",
-                        'error': None if result['verdict'] == "All tests passed" else result['details'][0]['traceback']
-                    }
-                    
-                    if not test_result['verdict'] == "All tests passed":
-                        all_passed = False
-                        results['error_types'][result['details'][0]['error_type']] += 1
-                    
-                    task_results.append(test_result)
-                    break  # Exit the retry loop if successful
-                except ConnectionError:
-                    retries -= 1
-                    if retries == 0:
-                        print(f"Error: Unable to connect to the server for task {task_id} after 3 attempts.")
-                        results['error_types']['ConnectionError'] += 1
-                        task_results.append({
-                            'task_id': task_id,
-                            'verdict': "ConnectionError",
-                            'error': 'ConnectionError: Unable to connect to the server after 3 attempts.'
-                        })
-                    else:
-                        print(f"Connection error for task {task_id}. Retrying in 10 seconds...")
-                        time.sleep(10)
-                except Exception as e:
-                    retries -= 1
-                    if retries == 0:
-                        print(f"Error evaluating test case for task {task_id}: {str(e)}")
-                        results['error_types']['EvaluationError'] += 1
-                        all_passed = False
-                        task_results.append({
-                            'task_id': task_id,
-                            'verdict': "EvaluationError",
-                            'error': str(e)
-                        })
-            
+
+            task_report, task_errors = self.evaluate_task(
+                task_id, code, efficiency=efficiency, cost_metric=cost_metric, result_store=result_store,
+                trace_recorder=trace_recorder
+            )
+            for error_type, count in task_errors.items():
+                results['error_types'][error_type] += count
+
             # Update task report
-            if all_passed:
+            if task_report['passed']:
                 results['passed_tasks'] += 1
             else:
                 results['failed_tasks'] += 1
-                
-            results['task_reports'][task_id] = {
-                'task_id': task_id,
-                'verdict': "All tests passed" if all_passed else "At least one test failed",
-                'test_results': task_results,
-                'passed': all_passed
-            }
-        
+            results['task_reports'][task_id] = task_report
+
         # Calculate summary statistics
         results['summary'] = {
             'total_tasks': results['total_tasks'],
@@ -130,7 +198,15 @@ class LeetCodeEvaluator:
             'pass_rate': results['passed_tasks'] / results['total_tasks'] if results['total_tasks'] > 0 else 0,
             'error_distribution': dict(results['error_types'])
         }
-        
+        if efficiency:
+            results['summary']['efficiency'] = summarize_efficiency(results['task_reports'].values())
+        if cost_metric:
+            results['summary']['cost'] = summarize_cost(results['task_reports'].values(), cost_metric)
+        if result_store is not None:
+            result_store.flush()
+        if trace_recorder is not None:
+            results['summary']['latency'] = trace_recorder.summarize()
+
         return results
 
     def save_report(self, results: Dict[str, Any], output_file: str):
@@ -2,17 +2,17 @@ import json
 import ast
 import io
 import sys
-from typing import Dict, List, Any, Tuple
-from datasets import load_dataset
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 from collections import defaultdict
 import time
-from tqdm import tqdm
 import re
 import ast
-import numpy as np
 import re
 from requests.exceptions import ConnectionError
+from evaluators.efficiency import summarize_efficiency, summarize_cost
+from evaluators.result_store import ResultStore
+from evaluators.tracing import TaskTrace, TraceRecorder, post_execute
 
 def extract_prefix_before_solution(code: str) -> str:
     lines = code.strip().split('\n')
@@ -41,8 +41,14 @@ def extract_prefix_before_solution(code: str) -> str:
     return '\n'.join(result_lines)
 
 class MBPPEvaluator:
-    def __init__(self, api_url: str = "http://localhost:1337/execute"):
+    def __init__(self, api_url: str = "http://localhost:1337/execute", tenant_id: str = "default",
+                 priority: str = "batch"):
+        from datasets import load_dataset
+
         self.api_url = api_url
+        # Sent with every request so the API can schedule this run fairly against others
+        self.tenant_id = tenant_id
+        self.priority = priority
         self.dataset = load_dataset("google-research-datasets/mbpp")
         self.test_cases = self._prepare_test_cases()
         
@@ -52,7 +58,8 @@ class MBPPEvaluator:
         for item in self.dataset['test']:
             test_cases[item['task_id']] = {
                 'test_list': item['test_list'],
-                'test_setup_code': item.get('test_setup_code', '')
+                'test_setup_code': item.get('test_setup_code', ''),
+                'reference_code': item['code']
             }
         return test_cases
     
@@ -66,16 +73,143 @@ class MBPPEvaluator:
             }
         return test_cases
 
-    def evaluate_predictions(self, predictions: Dict[str, str]) -> Dict[str, Any]:
+    def evaluate_task(self, task_id: Any, code: str, efficiency: bool = False,
+                      cost_metric: Optional[str] = None, result_store: Optional[ResultStore] = None,
+                      sample: int = 0, api_url: Optional[str] = None,
+                      trace_recorder: Optional[TraceRecorder] = None) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Evaluate a single prediction against its MBPP test cases.
+
+        Args:
+            task_id: Task to evaluate, must be in `test_cases`
+            code: Predicted code
+            efficiency: Also benchmark a passing solution against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            sample: Index of this prediction among the task's samples
+            api_url: Execution endpoint to use instead of `self.api_url`
+            trace_recorder: Trace the task's requests through the API and worker into this recorder
+
+        Returns:
+            Task report and the count of each error type it produced
+        """
+        api_url = api_url or self.api_url
+        trace = trace_recorder.start_task(task_id, sample) if trace_recorder is not None else None
+        error_types = defaultdict(int)
+        task_data = self.test_cases[task_id]
+        task_tests = task_data['test_list']
+        setup_code = task_data['test_setup_code']
+        task_results = []
+        all_passed = True
+
+        for test_case in task_tests:
+            retries = 3
+            while retries > 0:
+                try:
+                    # Combine solution code and setup code
+                    full_code = f"{code}\n\n{setup_code}"
+
+                    payload = {
+                        "code": full_code,
+                        "tests": [test_case],
+                        "timeout": 90,
+                        "tenant_id": self.tenant_id,
+                        "priority": self.priority
+                    }
+                    if cost_metric:
+                        payload["cost_metric"] = cost_metric
+
+                    result = post_execute(api_url, payload, trace, timeout=90)
+
+                    test_result = {
+                        'test_case': test_case,
+                        'passed': result['verdict'] == "All tests passed",
+                        'error': None if result['verdict'] == "All tests passed" else result['details'][0]['traceback'],
+                        'cost': result['details'][0].get('cost')
+                    }
+
+                    if not test_result['passed']:
+                        all_passed = False
+                        error_types[result['details'][0]['error_type']] += 1
+
+                    task_results.append(test_result)
+                    if result_store is not None:
+                        result_store.add_response(task_id, result, sample)
+                    break  # Exit the retry loop if successful
+                except ConnectionError:
+                    retries -= 1
+                    if retries == 0:
+                        print(f"Error: Unable to connect to the server for task {task_id} after 3 attempts.")
+                        error_types['ConnectionError'] += 1
+                        if result_store is not None:
+                            result_store.add(task_id, test_case, False, 'ConnectionError', sample=sample)
+                        task_results.append({
+                            'test_case': test_case,
+                            'passed': False,
+                            'error': 'ConnectionError: Unable to connect to the server after 3 attempts.'
+                        })
+                    else:
+                        print(f"Connection error for task {task_id}. Retrying in 10 seconds...")
+                        time.sleep(10)
+                except Exception as e:
+                    retries -= 1
+                    if retries == 0:
+                        print(f"Error evaluating test case for task {task_id}: {str(e)}")
+                        error_types['EvaluationError'] += 1
+                        if result_store is not None:
+                            result_store.add(task_id, test_case, False, 'EvaluationError', str(e), sample=sample)
+                        all_passed = False
+                        task_results.append({
+                            'test_case': test_case,
+                            'passed': False,
+                            'error': str(e)
+                        })
+
+        task_efficiency = None
+        if efficiency and all_passed:
+            task_efficiency = self._benchmark(
+                f"{code}\n\n{setup_code}",
+                f"{task_data['reference_code']}\n\n{setup_code}",
+                task_tests,
+                api_url,
+                trace
+            )
+
+        task_report = {
+            'task_id': task_id,
+            'verdict': "All tests passed" if all_passed else "At least one test failed",
+            'test_results': task_results,
+            'passed': all_passed
+        }
+        if efficiency:
+            task_report['efficiency'] = task_efficiency
+        if cost_metric:
+            task_report['cost'] = sum(r.get('cost') or 0 for r in task_results)
+
+        if trace is not None:
+            trace_recorder.finish_task(trace)
+
+        return task_report, dict(error_types)
+
+    def evaluate_predictions(self, predictions: Dict[str, str], efficiency: bool = False,
+                             cost_metric: Optional[str] = None,
+                             result_store: Optional[ResultStore] = None,
+                             trace_recorder: Optional[TraceRecorder] = None) -> Dict[str, Any]:
         """
         Evaluate predictions against MBPP test cases.
         
         Args:
             predictions: Dict mapping task_id to predicted code
+            efficiency: Also benchmark passing solutions against the reference solution
+            cost_metric: Count executed 'instructions' or 'lines' per test
+            result_store: Also record one row per test in this columnar store
+            trace_recorder: Trace requests into this recorder and summarize the slowest tasks
             
         Returns:
             Dict containing evaluation metrics and detailed reports
         """
+        from tqdm import tqdm
+
         results = {
             'total_tasks': len(predictions),
             'passed_tasks': 0,
@@ -89,82 +223,21 @@ class MBPPEvaluator:
             if task_id not in self.test_cases:
                 print(f"Warning: Task {task_id} not found in dataset")
                 continue
-                
-            task_data = self.test_cases[task_id]
-            task_tests = task_data['test_list']
-            setup_code = task_data['test_setup_code']
-            task_results = []
-            all_passed = True
-            
-            for test_case in task_tests:
-                retries = 3
-                while retries > 0:
-                    try:
-                        # Combine solution code and setup code
-                        full_code = f"{code}\n\n{setup_code}"
-                        
-                        response = requests.post(
-                            self.api_url,
-                            json={
-                                "code": full_code,
-                                "tests": [test_case],
-                                "timeout": 90
-                            },
-                            timeout=90  # Set a timeout for the request
-                        )
-                        response.raise_for_status()
-                        result = response.json()
-                        
-                        test_result = {
-                            'test_case': test_case,
-                            'passed': result['verdict'] == "All tests passed",
-                            'error': None if result['verdict'] == "All tests passed" else result['details'][0]['traceback']
-                        }
-                        
-                        if not test_result['passed']:
-                            all_passed = False
-                            results['error_types'][result['details'][0]['error_type']] += 1
-                        
-                        task_results.append(test_result)
-                        break  # Exit the retry loop if successful
-                    except ConnectionError:
-                        retries -= 1
-                        if retries == 0:
-                            print(f"Error: Unable to connect to the server for task {task_id} after 3 attempts.")
-                            results['error_types']['ConnectionError'] += 1
-                            task_results.append({
-                                'test_case': test_case,
-                                'passed': False,
-                                'error': 'ConnectionError: Unable to connect to the server after 3 attempts.'
-                            })
-                        else:
-                            print(f"Connection error for task {task_id}. Retrying in 10 seconds...")
-                            time.sleep(10)
-                    except Exception as e:
-                        retries -= 1
-                        if retries == 0:
-                            print(f"Error evaluating test case for task {task_id}: {str(e)}")
-                            results['error_types']['EvaluationError'] += 1
-                            all_passed = False
-                            task_results.append({
-                                'test_case': test_case,
-                                'passed': False,
-                                'error': str(e)
-                            })
-            
+
+            task_report, task_errors = self.evaluate_task(
+                task_id, code, efficiency=efficiency, cost_metric=cost_metric, result_store=result_store,
+                trace_recorder=trace_recorder
+            )
+            for error_type, count in task_errors.items():
+                results['error_types'][error_type] += count
+
             # Update task report
-            if all_passed:
+            if task_report['passed']:
                 results['passed_tasks'] += 1
             else:
                 results['failed_tasks'] += 1
-                
-            results['task_reports'][task_id] = {
-                'task_id': task_id,
-                'verdict': "All tests passed" if all_passed else "At least one test failed",
-                'test_results': task_results,
-                'passed': all_passed
-            }
-        
+            results['task_reports'][task_id] = task_report
+
         # Calculate summary statistics
         results['summary'] = {
             'total_tasks': results['total_tasks'],
@@ -173,9 +246,39 @@ class MBPPEvaluator:
             'pass_rate': results['passed_tasks'] / results['total_tasks'] if results['total_tasks'] > 0 else 0,
             'error_distribution': dict(results['error_types'])
         }
-        
+        if efficiency:
+            results['summary']['efficiency'] = summarize_efficiency(results['task_reports'].values())
+        if cost_metric:
+            results['summary']['cost'] = summarize_cost(results['task_reports'].values(), cost_metric)
+        if result_store is not None:
+            result_store.flush()
+        if trace_recorder is not None:
+            results['summary']['latency'] = trace_recorder.summarize()
+
         return results
 
+    def _benchmark(self, full_code: str, reference_code: str, tests: List[str], api_url: str,
+                   trace: Optional[TaskTrace] = None) -> Dict[str, Any]:
+        """Benchmark a passing solution against the reference on all of the task's tests."""
+        try:
+            result = post_execute(
+                api_url,
+                {
+                    "code": full_code,
+                    "tests": tests,
+                    "timeout": 90,
+                    "benchmark": True,
+                    "reference_code": reference_code,
+                    "tenant_id": self.tenant_id,
+                    "priority": self.priority
+                },
+                trace,
+                timeout=200  # candidate and reference are run one after another
+            )
+            return result.get('efficiency')
+        except Exception as e:
+            return {'error': str(e)}
+
     def save_report(self, results: Dict[str, Any], output_file: str):
         """Save the evaluation results to a JSON file."""
         results['summary']['pass_rate'] = results['passed_tasks'] / results['total_tasks'] if results['total_tasks'] > 0 else 0
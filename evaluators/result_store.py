@@ -0,0 +1,244 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, Any, Iterable, Optional
+from urllib.parse import quote, unquote
+
+# Parquet dataset layout under the store root:
+#   results/run_id=<run>/part-NNNNN.parquet     one row per (run, task, sample, test)
+#   tracebacks/run_id=<run>/part-NNNNN.parquet  one row per distinct traceback
+# <run> is URL-escaped, so run ids like 'org/model' stay one directory; reading decodes it
+RESULT_COLUMNS = ['benchmark', 'task_id', 'sample', 'test', 'passed', 'error_type', 'traceback_id', 'cost']
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The columnar result store requires pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def _partitioning():
+    pa = _pyarrow()
+    return pa.dataset.partitioning(pa.schema([('run_id', pa.string())]), flavor='hive')
+
+
+def _dataset(root: str, kind: str):
+    pa = _pyarrow()
+    return pa.dataset.dataset(os.path.join(root, kind), format='parquet', partitioning=_partitioning())
+
+
+class ResultStore:
+    """
+    Columnar sink for evaluation results.
+
+    Rows are buffered in column lists and written as Parquet parts every
+    `flush_rows` rows. Strings that repeat a lot (benchmark, task id, test,
+    error type) are dictionary encoded. Tracebacks are stored once per run,
+    keyed by a content hash that the result rows reference. Adding and
+    flushing are thread safe, so concurrent evaluations can share a store.
+    """
+
+    def __init__(self, root: str, run_id: str, benchmark: str = '', flush_rows: int = 100_000):
+        _pyarrow()
+        self.root = root
+        self.run_id = run_id
+        self.benchmark = benchmark
+        self.flush_rows = flush_rows
+        self._columns = {column: [] for column in RESULT_COLUMNS}
+        self._pending_tracebacks = {}
+        self._stored_tracebacks = set()
+        self._part = self._next_part()
+        self._lock = threading.RLock()
+
+    def _run_dir(self, kind: str) -> str:
+        return os.path.join(self.root, kind, f"run_id={quote(self.run_id, safe='')}")
+
+    def _next_part(self) -> int:
+        # Appending to an existing run continues its part numbering
+        run_dir = self._run_dir('results')
+        if not os.path.isdir(run_dir):
+            return 0
+        return len([name for name in os.listdir(run_dir) if name.endswith('.parquet')])
+
+    def add(self, task_id: str, test: str, passed: bool, error_type: Optional[str] = None,
+            traceback: Optional[str] = None, sample: int = 0, cost: Optional[int] = None):
+        """Buffer one test result."""
+        traceback_id = None
+        if traceback:
+            traceback_id = hashlib.blake2b(traceback.encode('utf-8', 'replace'), digest_size=8).hexdigest()
+
+        with self._lock:
+            if traceback_id is not None and traceback_id not in self._stored_tracebacks:
+                self._pending_tracebacks[traceback_id] = traceback
+                self._stored_tracebacks.add(traceback_id)
+
+            columns = self._columns
+            columns['benchmark'].append(self.benchmark)
+            columns['task_id'].append(str(task_id))
+            columns['sample'].append(sample)
+            columns['test'].append(test)
+            columns['passed'].append(passed)
+            columns['error_type'].append(error_type)
+            columns['traceback_id'].append(traceback_id)
+            columns['cost'].append(cost)
+            if len(columns['passed']) >= self.flush_rows:
+                self.flush()
+
+    def add_response(self, task_id: str, result: Dict[str, Any], sample: int = 0):
+        """Buffer every test result of an `/execute` response."""
+        for detail in result['details']:
+            self.add(
+                task_id,
+                detail['test'],
+                detail['status'] == 'passed',
+                error_type=detail.get('error_type'),
+                traceback=detail.get('traceback'),
+                sample=sample,
+                cost=detail.get('cost')
+            )
+
+    def flush(self):
+        """Write buffered rows and new tracebacks as the next Parquet part."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._columns['passed']:
+            return
+        pa = _pyarrow()
+        part_name = f"part-{self._part:05d}.parquet"
+
+        columns = self._columns
+        table = pa.table({
+            'benchmark': pa.array(columns['benchmark'], pa.string()).dictionary_encode(),
+            'task_id': pa.array(columns['task_id'], pa.string()).dictionary_encode(),
+            'sample': pa.array(columns['sample'], pa.int32()),
+            'test': pa.array(columns['test'], pa.string()).dictionary_encode(),
+            'passed': pa.array(columns['passed'], pa.bool_()),
+            'error_type': pa.array(columns['error_type'], pa.string()).dictionary_encode(),
+            'traceback_id': pa.array(columns['traceback_id'], pa.string()),
+            'cost': pa.array(columns['cost'], pa.int64())
+        })
+        os.makedirs(self._run_dir('results'), exist_ok=True)
+        pa.parquet.write_table(table, os.path.join(self._run_dir('results'), part_name), compression='zstd')
+
+        if self._pending_tracebacks:
+            tracebacks = pa.table({
+                'traceback_id': pa.array(list(self._pending_tracebacks.keys()), pa.string()),
+                'traceback': pa.array(list(self._pending_tracebacks.values()), pa.string())
+            })
+            os.makedirs(self._run_dir('tracebacks'), exist_ok=True)
+            pa.parquet.write_table(tracebacks, os.path.join(self._run_dir('tracebacks'), part_name), compression='zstd')
+
+        self._columns = {column: [] for column in RESULT_COLUMNS}
+        self._pending_tracebacks = {}
+        self._part += 1
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def _summarize_table(table) -> Dict[str, Any]:
+    pa = _pyarrow()
+    pc = pa.compute
+    # Each Parquet part carries its own dictionaries; grouping needs one per column
+    table = table.unify_dictionaries()
+    per_task = table.group_by(['benchmark', 'task_id', 'sample']).aggregate([('passed', 'all')])
+    total_tasks = per_task.num_rows
+    passed_tasks = pc.sum(per_task['passed_all']).as_py() or 0
+
+    failures = table.filter(pc.invert(table['passed']))
+    error_counts = pc.value_counts(pc.fill_null(failures['error_type'].cast(pa.string()), 'UnknownError'))
+    error_distribution = {
+        item['values'].as_py(): item['counts'].as_py() for item in error_counts
+    }
+    return {
+        'total_tasks': total_tasks,
+        'passed_tasks': passed_tasks,
+        'failed_tasks': total_tasks - passed_tasks,
+        'pass_rate': passed_tasks / total_tasks if total_tasks > 0 else 0,
+        'error_distribution': error_distribution
+    }
+
+
+def read_results(root: str, columns: List[str], run_ids: Optional[Iterable[str]] = None,
+                 benchmark: Optional[str] = None):
+    """
+    Read result rows of a store as a pyarrow Table.
+
+    Args:
+        root: Result store root directory
+        columns: Columns to read, any of RESULT_COLUMNS and 'run_id'
+        run_ids: Restrict to these runs
+        benchmark: Restrict to one benchmark
+    """
+    pa = _pyarrow()
+    condition = None
+    if run_ids is not None:
+        condition = pa.dataset.field('run_id').isin(list(run_ids))
+    if benchmark is not None:
+        benchmark_condition = pa.dataset.field('benchmark') == benchmark
+        condition = benchmark_condition if condition is None else condition & benchmark_condition
+    return _dataset(root, 'results').to_table(columns=columns, filter=condition)
+
+
+def summarize_run(root: str, run_id: str, benchmark: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Compute the evaluator summary of a stored run with vectorized operations.
+
+    Args:
+        root: Result store root directory
+        run_id: Run to summarize
+        benchmark: Restrict to one benchmark if the run covers several
+
+    Returns:
+        Dict in the same shape as the evaluators' `summary`
+    """
+    table = read_results(root, ['benchmark', 'task_id', 'sample', 'passed', 'error_type'], [run_id], benchmark)
+    return _summarize_table(table)
+
+
+def compare_runs(root: str, run_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Summarize several stored runs side by side.
+
+    Only the columns needed for the summary are read, and each run is scanned
+    on its own, so memory is bounded by the largest single run rather than by
+    the whole sweep.
+    """
+    pa = _pyarrow()
+    dataset = _dataset(root, 'results')
+    if run_ids is None:
+        run_ids = sorted(unquote(name.split('=', 1)[1]) for name in os.listdir(os.path.join(root, 'results'))
+                         if name.startswith('run_id='))
+    comparison = []
+    for run_id in run_ids:
+        table = dataset.to_table(
+            columns=['benchmark', 'task_id', 'sample', 'passed', 'error_type'],
+            filter=pa.dataset.field('run_id') == run_id
+        )
+        comparison.append({'run_id': run_id, **_summarize_table(table)})
+    return comparison
+
+
+def load_tracebacks(root: str, run_id: str, traceback_ids: Iterable[str]) -> Dict[str, str]:
+    """Look up the traceback text for the given ids of a run."""
+    pa = _pyarrow()
+    table = _dataset(root, 'tracebacks').to_table(
+        columns=['traceback_id', 'traceback'],
+        filter=(pa.dataset.field('run_id') == run_id)
+        & pa.dataset.field('traceback_id').isin(list(traceback_ids))
+    )
+    return dict(zip(table['traceback_id'].to_pylist(), table['traceback'].to_pylist()))
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
+
+import requests
+
+# Rows of the Chrome trace viewer / Perfetto, one per process a span was recorded in
+TRACE_PROCESSES = {'evaluator': 1, 'api': 2, 'worker': 3}
+
+
+class TaskTrace:
+    """Spans of one task (one prediction), recorded by the evaluator and returned by the API."""
+
+    def __init__(self, task_id: Any, sample: int = 0):
+        self.task_id = task_id
+        self.sample = sample
+        self.trace_id = os.urandom(16).hex()
+        self.start = time.time()
+        self.spans = []
+
+    def traceparent(self) -> str:
+        """W3C traceparent header for the next request of this task."""
+        return f"00-{self.trace_id}-{os.urandom(8).hex()}-01"
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.spans.append({'name': name, 'process': 'evaluator', 'start': start,
+                               'duration': time.time() - start, 'args': args or None})
+
+    def add_server_spans(self, spans: Optional[List[Dict[str, Any]]]):
+        self.spans.extend(spans or [])
+
+
+def post_execute(api_url: str, payload: Dict[str, Any], trace: Optional[TaskTrace] = None,
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Send a payload to the `/execute` endpoint and return the parsed response.
+
+    With a `trace`, the request carries a traceparent header so that the API
+    returns its own spans, and the client side is split into serialize, http
+    and parse spans.
+    """
+    if trace is None:
+        response = requests.post(api_url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    with trace.span('serialize'):
+        body = json.dumps(payload)
+    with trace.span('http'):
+        response = requests.post(
+            api_url,
+            data=body,
+            headers={'Content-Type': 'application/json', 'traceparent': trace.traceparent()},
+            timeout=timeout
+        )
+        response.raise_for_status()
+    with trace.span('parse'):
+        result = response.json()
+    trace.add_server_spans(result.get('trace'))
+    return result
+
+
+class TraceRecorder:
+    """
+    Writes task traces to a Chrome Trace Event JSON file as tasks finish.
+
+    The file can be opened in chrome://tracing or https://ui.perfetto.dev, with
+    one row per process and one thread per task. Only a per-stage total is kept
+    in memory for each task, for the latency summary. Thread safe, so concurrent
+    evaluations can share a recorder.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._task_totals = []
+        self._lock = threading.Lock()
+
+    def start_task(self, task_id: Any, sample: int = 0) -> TaskTrace:
+        return TaskTrace(task_id, sample)
+
+    def finish_task(self, trace: TaskTrace):
+        """Record a finished task, its whole evaluation becomes the 'task' span."""
+        total = time.time() - trace.start
+        stages = defaultdict(float)
+        for span in trace.spans:
+            stages[f"{span['process']}/{span['name']}"] += span['duration']
+        # What the HTTP round trip spent outside of the API's request handling
+        if 'evaluator/http' in stages and 'api/request' in stages:
+            stages['evaluator/transport'] = max(stages['evaluator/http'] - stages['api/request'], 0.0)
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'w')
+                # Chrome also loads the array format unterminated, should the run not finish
+                self._file.write('[\n')
+                self._write_events([{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': process}}
+                                    for process, pid in TRACE_PROCESSES.items()], first=True)
+            tid = len(self._task_totals) + 1
+            events = [{
+                'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                'args': {'name': f"{trace.task_id}#{trace.sample}"}
+            } for pid in TRACE_PROCESSES.values()]
+            spans = [{'name': 'task', 'process': 'evaluator', 'start': trace.start, 'duration': total,
+                      'args': {'task_id': str(trace.task_id), 'sample': trace.sample, 'trace_id': trace.trace_id}}]
+            for span in spans + trace.spans:
+                events.append({
+                    'name': span['name'],
+                    'cat': span['process'],
+                    'ph': 'X',
+                    'ts': span['start'] * 1e6,
+                    'dur': span['duration'] * 1e6,
+                    'pid': TRACE_PROCESSES.get(span['process'], 0),
+                    'tid': tid,
+                    'args': span.get('args') or {}
+                })
+            self._write_events(events)
+            self._task_totals.append({
+                'task_id': trace.task_id,
+                'sample': trace.sample,
+                'total': total,
+                'stages': dict(stages)
+            })
+
+    def _write_events(self, events: List[Dict[str, Any]], first: bool = False):
+        for index, event in enumerate(events):
+            if not (first and index == 0):
+                self._file.write(',\n')
+            self._file.write(json.dumps(event))
+        self._file.flush()
+
+    def summarize(self, slowest: int = 10) -> Dict[str, Any]:
+        """
+        Latency breakdown of the slowest tasks.
+
+        Args:
+            slowest: Number of tasks to report
+
+        Returns:
+            Dict with the number of traced tasks and, for each of the slowest
+            tasks, its total seconds and the seconds spent per 'process/stage'.
+            Nested stages overlap, e.g. 'evaluator/http' contains 'api/request'.
+        """
+        with self._lock:
+            tasks = sorted(self._task_totals, key=lambda task: task['total'], reverse=True)[:slowest]
+            return {
+                'traced_tasks': len(self._task_totals),
+                'trace_file': self.path,
+                'slowest_tasks': [{
+                    'task_id': task['task_id'],
+                    'sample': task['sample'],
+                    'total': task['total'],
+                    'stages': dict(sorted(task['stages'].items(), key=lambda item: item[1], reverse=True))
+                } for task in tasks]
+            }
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.write('\n]\n')
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The API lives in docker/ and is imported as a top-level module there
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'docker')]
@@ -0,0 +1,92 @@
+import pytest
+
+from evaluators.case_profile import build_case_profile, split_check_harness
+
+# Shaped like the HumanEval+ harnesses: an assertion helper and one loop over input/result tables
+HARNESS = '''
+import math
+
+def is_floats(x) -> bool:
+    if isinstance(x, float):
+        return True
+    if isinstance(x, (list, tuple)):
+        return all(isinstance(i, float) for i in x)
+    return False
+
+def assertion(out, exp, atol):
+    exact_match = out == exp
+    if atol == 0 and is_floats(exp):
+        atol = 1e-6
+    if not exact_match and atol != 0:
+        assert math.isclose(out, exp, rel_tol=1e-07, abs_tol=atol)
+    else:
+        assert exact_match
+
+
+def check(candidate):
+    inputs = [[1, 2], [3, 4], [0, 0], [-1, 1], [10**20, 1], [0.1, 0.2]]
+    results = [3, 7, 0, 0, 10**20 + 1, 0.30000000000000004]
+    for i, (inp, exp) in enumerate(zip(inputs, results)):
+        assertion(candidate(*inp), exp, 0)
+'''
+
+CANDIDATES = [
+    lambda a, b: a + b,
+    lambda a, b: abs(a) + b,
+    lambda a, b: int(a + b),
+    lambda a, b: a + b if a < 100 else 0,
+    lambda a, b: round(a + b, 3),
+]
+
+
+def verdict(run) -> bool:
+    try:
+        run()
+    except AssertionError:
+        return False
+    return True
+
+
+@pytest.mark.parametrize('candidate', CANDIDATES)
+def test_check_cases_on_all_inputs_matches_check(candidate):
+    harness, num_cases = split_check_harness(HARNESS)
+    assert num_cases == 6
+    namespace = {}
+    exec(harness, namespace)
+
+    expected = verdict(lambda: namespace['check'](candidate))
+    assert verdict(lambda: namespace['check_cases'](candidate, range(num_cases))) == expected
+    failing = [case for case in range(num_cases)
+               if not verdict(lambda: namespace['check_cases'](candidate, [case]))]
+    assert bool(failing) != expected
+
+
+@pytest.mark.parametrize('harness', [
+    "def check(candidate):\n    assert candidate(1) == 2\n",
+    "def check(candidate):\n    inputs = load()\n    results = [2]\n"
+    "    for i, (inp, exp) in enumerate(zip(inputs, results)):\n        assert candidate(*inp) == exp\n",
+    "def check(candidate):\n    inputs = [[1]]\n    results = [2]\n"
+    "    for i, (inp, exp) in enumerate(zip(inputs, results)):\n        inputs = []\n",
+    "def check(candidate, extra):\n    pass\n",
+    "def test(candidate):\n    pass\n",
+    "def check(candidate:\n",
+])
+def test_split_check_harness_rejects_other_harnesses(harness):
+    assert split_check_harness(harness) is None
+
+
+def test_reject_subset_covers_every_failing_candidate():
+    failures = [[0, 3], [3], [5, 7], [7, 9], [1], [2, 4, 6], [], [8], [9]]
+    reports = [{'task_id': 'HumanEval/0', 'num_cases': 10, 'case_failures': cases} for cases in failures]
+    # Recorded against another version of the task, must be ignored
+    reports.append({'task_id': 'HumanEval/0', 'num_cases': 4, 'case_failures': [0]})
+
+    profile = build_case_profile(reports)['HumanEval/0']
+
+    subset = set(profile['reject_subset'])
+    assert all(subset & set(cases) for cases in failures if cases)
+    assert len(subset) < sum(1 for cases in failures if cases)
+    assert sorted(profile['order']) == list(range(10))
+    assert profile['order'][:len(subset)] == profile['reject_subset']
+    assert profile['candidates'] == 9
+    assert profile['failing_candidates'] == 8
@@ -0,0 +1,90 @@
+import hashlib
+import marshal
+
+import pytest
+
+import docker_api
+from docker_api import CodeCache, execute_with_timeout
+
+SOURCE = "def add(a, b):\n    return a + b\n"
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    """Sources the API process compiled."""
+    sources = []
+    real_compile = compile
+
+    def counting_compile(source, filename, mode, *args, **kwargs):
+        sources.append(source)
+        return real_compile(source, filename, mode, *args, **kwargs)
+
+    monkeypatch.setattr(docker_api, 'compile', counting_compile, raising=False)
+    return sources
+
+
+def test_first_submission_is_left_to_the_worker(compiles):
+    cache = CodeCache(1 << 20)
+    assert cache.get(SOURCE) is None
+    assert compiles == []
+
+
+def test_repeated_source_is_compiled_once_and_hit(compiles):
+    cache = CodeCache(1 << 20)
+    cache.get(SOURCE)
+    data = cache.get(SOURCE)
+    namespace = {}
+    exec(marshal.loads(data), namespace)
+    assert namespace['add'](1, 2) == 3
+
+    assert cache.get(SOURCE) is data
+    assert cache.get(SOURCE, '<harness>') is None  # the filename is part of the key
+    assert compiles == [SOURCE]
+
+
+def test_least_recently_used_entries_are_evicted():
+    sources = [f"def f{index}():\n    return {index}\n" for index in range(3)]
+    size = len(marshal.dumps(compile(sources[0], '<string>', 'exec')))
+    cache = CodeCache(2 * size + size // 2)
+    for source in sources[:2] * 2:
+        cache.get(source)
+    cache.get(sources[0])  # most recently used
+    cache.get(sources[2])
+    cache.get(sources[2])
+
+    assert cache._size <= cache.max_bytes
+    assert len(cache._entries) == 2
+    cached = [hashlib.sha256(b'<string>\0' + source.encode()).digest() in cache._entries for source in sources]
+    assert cached == [True, False, True]
+
+
+def test_seen_sources_are_bounded():
+    cache = CodeCache(1 << 20, seen_entries=10)
+    for index in range(100):
+        cache.get(f"x = {index}\n")
+    assert len(cache._seen) == 10
+
+
+def test_disabled_cache_compiles_nothing(compiles):
+    cache = CodeCache(0)
+    for _ in range(3):
+        assert cache.get(SOURCE) is None
+    assert compiles == []
+
+
+def test_code_that_does_not_compile_is_compiled_by_the_worker(compiles, monkeypatch):
+    monkeypatch.setattr(docker_api, 'code_cache', CodeCache(1 << 20))
+    for _ in range(3):
+        response = execute_with_timeout("def add(a, b) return", ["assert add(1, 2) == 3"], 10)
+        assert response.verdict == "At least one test error"
+        assert response.details[0].error_type == "CompilationError"
+    # Tried once in the API on the second submission, then left to the worker
+    assert compiles == ["def add(a, b) return"]
+
+
+def test_cached_code_runs_in_the_worker(monkeypatch):
+    monkeypatch.setattr(docker_api, 'code_cache', CodeCache(1 << 20))
+    for _ in range(3):
+        response = execute_with_timeout(SOURCE, ["assert add(1, 2) == 3"], 10)
+        assert response.verdict == "All tests passed"
+    assert len(docker_api.code_cache._entries) == 1
@@ -0,0 +1,55 @@
+import io
+import json
+
+import evaluate
+
+
+class FakeEvaluator:
+    """Passes predictions that return 1, raises for 'crash'."""
+
+    def __init__(self, api_url, tenant_id, priority):
+        self.test_cases = {'t1': None, 't2': None, 't3': None}
+
+    def evaluate_task(self, task_id, code, **options):
+        if code == 'crash':
+            raise RuntimeError("server returned garbage")
+        passed = code == 'return 1'
+        return {'task_id': task_id, 'verdict': "All tests passed" if passed else "At least one test failed",
+                'test_results': [], 'passed': passed}, {} if passed else {'AssertionError': 1}
+
+
+def test_read_predictions_skips_malformed_lines(capsys):
+    stream = io.StringIO(
+        '{"task_id": "t1", "completion": "a"}\n'
+        '\n'
+        '{"task_id": "t2"}\n'
+        '[1, 2]\n'
+        '{"task_id": "t3", "code": "b", "sample": 2}\n'
+        '{"task_id": "t1", "compl'
+    )
+    predictions = list(evaluate.read_predictions(stream))
+
+    assert predictions == [{'task_id': 't1', 'code': 'a', 'sample': 0}, {'task_id': 't3', 'code': 'b', 'sample': 2}]
+    warnings = capsys.readouterr().out
+    assert all(f"Skipping line {line}" in warnings for line in (3, 4, 6))
+
+
+def test_totals_cover_every_prediction(tmp_path, monkeypatch):
+    monkeypatch.setitem(evaluate.EVALUATORS, 'mbpp', (__name__, 'FakeEvaluator'))
+    predictions = tmp_path / 'predictions.jsonl'
+    predictions.write_text('\n'.join(json.dumps(record) for record in [
+        {'task_id': 't1', 'completion': 'return 1'},
+        {'task_id': 't2', 'completion': 'return 2'},
+        {'task_id': 't3', 'completion': 'crash'},
+    ]) + '\n{"task_id": "t1", "completion": "ret')
+    output, summary = tmp_path / 'reports.jsonl', tmp_path / 'summary.json'
+
+    evaluate.main(['--benchmark', 'mbpp', '--predictions', str(predictions), '--output', str(output),
+                   '--summary', str(summary)])
+
+    reports = {report['task_id']: report for report in map(json.loads, output.read_text().splitlines())}
+    assert sorted(reports) == ['t1', 't2', 't3']
+    assert reports['t3']['test_results'][0]['verdict'] == "EvaluationError"
+    totals = json.loads(summary.read_text())
+    assert (totals['total_tasks'], totals['passed_tasks'], totals['failed_tasks']) == (3, 1, 2)
+    assert totals['error_distribution'] == {'AssertionError': 1, 'EvaluationError': 1}
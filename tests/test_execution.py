@@ -0,0 +1,57 @@
+import time
+
+import docker_api
+from docker_api import build_response, job_cpu_allowance, run_code_and_tests
+
+PASSED = {'verdict': "All tests passed",
+          'details': [{'test': 'assert True', 'status': 'passed', 'error_type': None, 'traceback': None}]}
+
+
+def test_job_stopped_after_it_finished_keeps_its_result():
+    response = build_response({**PASSED, 'elapsed': 0.5}, timed_out=True, timeout=5)
+    assert response.verdict == "All tests passed"
+    assert response.efficiency is None
+
+
+def test_timed_out_benchmark_keeps_the_test_verdict():
+    response = build_response(dict(PASSED), timed_out=True, timeout=5, benchmark_runs=10)
+    assert response.verdict == "All tests passed"
+    assert "Benchmark exceeded time limit" in response.efficiency.error
+
+
+def test_timed_out_tests_fail():
+    response = build_response({}, timed_out=True, timeout=5)
+    assert response.verdict == "At least one test error"
+    assert response.details[0].error_type == "TimeLimit"
+    assert response.efficiency is None
+
+
+def run_isolated(tests, workers):
+    shared_dict = {}
+    run_code_and_tests("import time\n", tests, shared_dict, timeout=10, isolate_tests=True, test_workers=workers)
+    return shared_dict
+
+
+def test_isolated_tests_run_in_parallel():
+    tests = ["time.sleep(0.5)", "time.sleep(0.5)"]
+    start = time.monotonic()
+    shared_dict = run_isolated(tests, workers=2)
+    elapsed = time.monotonic() - start
+
+    assert shared_dict['verdict'] == "All tests passed"
+    assert elapsed < 0.9
+
+
+def test_isolated_tests_do_not_share_state():
+    shared_dict = run_isolated(["seen = 1", "assert 'seen' not in globals()", "1 / 0"], workers=2)
+    assert [detail['status'] for detail in shared_dict['details']] == ['passed', 'passed', 'failed']
+    assert shared_dict['details'][2]['error_type'] == 'ZeroDivisionError'
+
+
+def test_idle_node_gives_a_job_every_cpu(monkeypatch):
+    monkeypatch.setattr(docker_api.os, 'sched_getaffinity', lambda pid: set(range(8)), raising=False)
+    assert job_cpu_allowance() == 8
+    monkeypatch.setattr(docker_api.scheduler, 'running_jobs', lambda: 3)
+    assert job_cpu_allowance() == 2
+    monkeypatch.setattr(docker_api.scheduler, 'running_jobs', lambda: 20)
+    assert job_cpu_allowance() == 1
@@ -0,0 +1,54 @@
+import sys
+
+import pytest
+
+from docker_api import InstructionCounter
+
+
+@pytest.fixture(params=['monitoring', 'settrace'])
+def backend(request, monkeypatch):
+    if request.param == 'monitoring' and not hasattr(sys, 'monitoring'):
+        pytest.skip("sys.monitoring needs Python 3.12+")
+    if request.param == 'settrace':
+        monkeypatch.delattr(sys, 'monitoring', raising=False)
+    return request.param
+
+
+def count(metric: str, source: str) -> int:
+    code = compile(source, '<candidate>', 'exec')
+    with InstructionCounter(metric) as counter:
+        exec(code, {})
+    return counter.count
+
+
+@pytest.mark.parametrize('source', [
+    "sum([i * i for i in range({n})])",
+    "s = 0\nwhile s < {n}: s += 1\n",
+    "s = 0\nfor i in range({n}):\n    s += i * i\n",
+    "def f(k):\n    return k\nsum(f(i) for i in range({n}))\n",
+])
+@pytest.mark.parametrize('metric', ['instructions', 'lines'])
+def test_count_grows_with_iterations(backend, metric, source):
+    small = count(metric, source.format(n=10))
+    large = count(metric, source.format(n=1010))
+    # At least one event per iteration, also for loops that stay on one line
+    assert large - small >= 1000
+
+
+@pytest.mark.parametrize('metric', ['instructions', 'lines'])
+def test_count_is_deterministic(backend, metric):
+    source = "def fib(n):\n    return n if n < 2 else fib(n - 1) + fib(n - 2)\nfib(12)\n"
+    assert count(metric, source) == count(metric, source)
+
+
+def test_counter_restores_previous_trace(backend):
+    def tracer(frame, event, arg):
+        return None
+
+    previous = sys.gettrace()
+    sys.settrace(tracer)
+    try:
+        count('lines', "x = 1\n")
+        assert sys.gettrace() is tracer
+    finally:
+        sys.settrace(previous)
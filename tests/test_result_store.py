@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from evaluators.result_store import ResultStore, compare_runs, load_tracebacks, read_results, summarize_run
+
+RUN_IDS = ['model-a-ckpt-1000', 'meta-llama/Llama-3-8B', 'run 2 %20 = done?']
+
+
+def write_run(root, run_id):
+    with ResultStore(str(root), run_id, benchmark='mbpp') as store:
+        store.add('1', 'assert f(1) == 1', True)
+        store.add('1', 'assert f(2) == 2', False, 'AssertionError', 'Traceback: f(2)')
+        store.add('2', 'assert g() == 0', True, sample=1)
+
+
+@pytest.mark.parametrize('run_id', RUN_IDS)
+def test_run_round_trip(tmp_path, run_id):
+    write_run(tmp_path, run_id)
+
+    assert summarize_run(str(tmp_path), run_id) == {
+        'total_tasks': 2,
+        'passed_tasks': 1,
+        'failed_tasks': 1,
+        'pass_rate': 0.5,
+        'error_distribution': {'AssertionError': 1}
+    }
+    table = read_results(str(tmp_path), ['run_id', 'traceback_id'], [run_id])
+    assert set(table['run_id'].to_pylist()) == {run_id}
+    traceback_id = next(value for value in table['traceback_id'].to_pylist() if value)
+    assert load_tracebacks(str(tmp_path), run_id, [traceback_id]) == {traceback_id: 'Traceback: f(2)'}
+
+
+def test_compare_runs_lists_every_run(tmp_path):
+    for run_id in RUN_IDS:
+        write_run(tmp_path, run_id)
+    # Appending to a run continues it
+    write_run(tmp_path, RUN_IDS[1])
+
+    comparison = compare_runs(str(tmp_path))
+    assert sorted(run['run_id'] for run in comparison) == sorted(RUN_IDS)
+    assert all(run['total_tasks'] == 2 for run in comparison)
+    assert len(list((tmp_path / 'results').iterdir())) == len(RUN_IDS)
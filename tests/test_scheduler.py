@@ -0,0 +1,93 @@
+import threading
+import time
+
+import docker_api
+from docker_api import FairScheduler
+
+
+def wait_until(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.01)
+
+
+def blocking_job(started: threading.Event, release: threading.Event):
+    def run():
+        started.set()
+        release.wait(5)
+    return run
+
+
+def test_interactive_jobs_overtake_queued_batch_jobs():
+    scheduler = FairScheduler(workers=1, default_quota=1)
+    started, release = threading.Event(), threading.Event()
+    gate = scheduler.submit('gate', 'interactive', blocking_job(started, release))
+    started.wait(5)
+
+    order = []
+    futures = [scheduler.submit('sweep', 'batch', lambda i=i: order.append(f"batch{i}")) for i in range(4)]
+    futures += [scheduler.submit('user', 'interactive', lambda i=i: order.append(f"interactive{i}")) for i in range(2)]
+    release.set()
+    for future in [gate, *futures]:
+        future.result(5)
+
+    # Each batch job advances its flow by 8 interactive jobs' worth of virtual time
+    assert order == ['batch0', 'interactive0', 'interactive1', 'batch1', 'batch2', 'batch3']
+
+
+def test_tenant_quota_limits_concurrent_jobs():
+    scheduler = FairScheduler(workers=4, default_quota=4, quotas={'small': 1})
+    lock = threading.Lock()
+    running = {'small': 0, 'large': 0}
+    peak = {'small': 0, 'large': 0}
+
+    def job(tenant_id):
+        def run():
+            with lock:
+                running[tenant_id] += 1
+                peak[tenant_id] = max(peak[tenant_id], running[tenant_id])
+            time.sleep(0.05)
+            with lock:
+                running[tenant_id] -= 1
+        return run
+
+    futures = [scheduler.submit(tenant_id, 'interactive', job(tenant_id))
+               for _ in range(3) for tenant_id in ['small', 'large']]
+    for future in futures:
+        future.result(5)
+
+    assert peak['small'] == 1
+    assert peak['large'] > 1
+
+
+def test_batch_jobs_leave_a_worker_for_interactive_jobs():
+    scheduler = FairScheduler(workers=2, default_quota=2)
+    assert scheduler.batch_workers == 1
+    release = threading.Event()
+    started = [threading.Event(), threading.Event()]
+    batch = [scheduler.submit('sweep', 'batch', blocking_job(event, release)) for event in started]
+
+    assert started[0].wait(5)
+    interactive = scheduler.submit('user', 'interactive', lambda: 'done')
+    result, _ = interactive.result(5)
+    assert result == 'done'
+    assert not started[1].is_set()
+
+    release.set()
+    for future in batch:
+        future.result(5)
+    assert started[1].is_set()
+
+
+def test_idle_tenants_are_forgotten(monkeypatch):
+    monkeypatch.setattr(docker_api, 'MAX_RECORDED_TENANTS', 10)
+    scheduler = FairScheduler(workers=2, default_quota=2)
+    for index in range(50):
+        scheduler.submit(f"tenant-{index}", 'batch', lambda: None).result(5)
+
+    wait_until(lambda: not scheduler._running)
+    assert scheduler._last_finish == {}
+    assert len(scheduler._waits) == 10
+    assert 'tenant-49' in scheduler.stats()['tenants']
+    assert 'tenant-0' not in scheduler.stats()['tenants']
@@ -0,0 +1,72 @@
+import hashlib
+import time
+
+import pytest
+
+import docker_api
+from docker_api import ZygotePool, execute_with_timeout
+
+HARNESS = '''
+import math
+INPUTS = [1, 2, 3]
+EXPECTED = [2, 4, 6]
+
+def check(candidate):
+    for value, expected in zip(INPUTS, EXPECTED):
+        assert candidate(value) == expected
+'''
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ZygotePool(1 << 40)
+    monkeypatch.setattr(docker_api, 'zygote_pool', pool)
+    yield pool
+    pool.close()
+
+
+def run(code: str, harness: str = HARNESS):
+    response = execute_with_timeout(code, ["check(double)"], 10, harness=harness)
+    return response.verdict, response.details[0].error_type
+
+
+def test_candidate_cannot_see_or_mutate_harness_names(pool):
+    correct = "def double(x):\n    return 2 * x\n"
+    assert run(correct) == ("All tests passed", None)
+    assert len(pool._zygotes) == 1
+
+    # The harness's import is not visible to the code, as if the harness ran after it
+    assert run("y = math.pi\n" + correct) == ("At least one test error", "RuntimeError")
+    # Nor are its tables, so emptying them cannot make a wrong solution pass
+    wrong = "try:\n    INPUTS.clear()\nexcept NameError:\n    pass\ndef double(x):\n    return 0\n"
+    assert run(wrong) == ("At least one test error", "AssertionError")
+    # Harness names the code rebinds are restored for the tests
+    assert run("EXPECTED = [0, 0, 0]\ndef double(x):\n    return 0\n") == ("At least one test error", "AssertionError")
+    assert run(correct) == ("All tests passed", None)
+    assert len(pool._zygotes) == 1
+
+
+def test_harness_that_raises_is_appended_to_the_code(pool):
+    harness = "reference = double\n\ndef check(candidate):\n    assert candidate(2) == reference(2)\n"
+    assert run("def double(x):\n    return 2 * x\n", harness) == ("All tests passed", None)
+
+    key = hashlib.sha256(harness.encode()).hexdigest()
+    assert pool._zygotes == {}
+    assert pool._failed[key] == float('inf')
+    assert pool.get(harness) is None
+
+
+def test_harness_that_timed_out_is_retried(pool, monkeypatch):
+    harness = "import time\ntime.sleep(1)\n"
+    monkeypatch.setattr(docker_api, 'ZYGOTE_SETUP_TIMEOUT', 0.2)
+    monkeypatch.setattr(docker_api, 'ZYGOTE_RETRY_DELAY', 1)
+    assert pool.get(harness) is None
+
+    # Not started again until the delay has passed
+    start = time.monotonic()
+    assert pool.get(harness) is None
+    assert time.monotonic() - start < 0.1
+
+    time.sleep(1)
+    monkeypatch.setattr(docker_api, 'ZYGOTE_SETUP_TIMEOUT', 10)
+    assert pool.get(harness) is not None